@@ -1,24 +1,325 @@
-import requests
+import asyncio
+import hashlib
+import httpx
 import logging
-from typing import List, Dict, Any, Optional
-import json
+from cachetools import LRUCache
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
+import orjson
+import tiktoken
 import time
+from urllib.parse import quote
 
 try:
 	from .config import settings
 	from .models import FileContent
+	from .llm_cache import LLMCache, content_sha, make_cache_key, response_cache
+	from .retry import retry_transient
 except ImportError:
 	from config import settings
 	from models import FileContent
+	from llm_cache import LLMCache, content_sha, make_cache_key, response_cache
+	from retry import retry_transient
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Upper bound on per-file batch requests in flight at once
+MAX_CONCURRENT_BATCHES = 8
+
+# Token budgets for source code embedded in prompts
+SUMMARY_FILE_TOKEN_BUDGET = 500
+CODE_SOURCE_TOKEN_BUDGET = 750
+
+# Token ceiling for the source in one batched summary prompt; larger file sets are split across calls
+MAX_BATCH_TOKENS = 6000
+
+# Tokens allowed for each file's delimiter line in a batched summary prompt
+_BATCH_FILE_OVERHEAD_TOKENS = 24
+
+# Rough characters-per-token ratio used when the tokenizer is unavailable
+_CHARS_PER_TOKEN = 4
+
+# Seconds before a failed tokenizer load is attempted again
+ENCODING_RETRY_INTERVAL = 60
+
+# BPE tokenizer, set by load_encoding; None until it has loaded successfully
+_encoding: Optional[tiktoken.Encoding] = None
+_encoding_retry_at = 0.0
+
+def load_encoding() -> Optional[tiktoken.Encoding]:
+	"""
+	Load the BPE tokenizer, which may download its vocabulary with blocking I/O.
+	
+	Run off the event loop through start_encoding_load. A failure is not
+	remembered beyond ENCODING_RETRY_INTERVAL.
+	"""
+	global _encoding, _encoding_retry_at
+	try:
+		encoding = tiktoken.get_encoding("cl100k_base")
+	except Exception as e:
+		_encoding_retry_at = time.monotonic() + ENCODING_RETRY_INTERVAL
+		logger.warning("Failed to load tiktoken encoding, falling back to character limits: %s", e)
+		return None
+	_encoding = encoding
+	return encoding
+
+def start_encoding_load() -> None:
+	"""Load the tokenizer in a worker thread without waiting for it; callers use character limits meanwhile"""
+	global _encoding_retry_at
+	# Hold off further attempts while this one is in flight
+	_encoding_retry_at = time.monotonic() + ENCODING_RETRY_INTERVAL
+	asyncio.get_running_loop().run_in_executor(None, load_encoding)
+
+def _get_encoding() -> Optional[tiktoken.Encoding]:
+	"""The loaded tokenizer, or None while unavailable; a missing one is (re)loaded in a worker thread, never on the event loop"""
+	if _encoding is None and time.monotonic() >= _encoding_retry_at:
+		try:
+			start_encoding_load()
+		except RuntimeError:
+			# No running event loop to schedule the load on
+			pass
+	return _encoding
+
+# Generous characters-per-token bound; only the first budget * this characters are encoded
+_MAX_CHARS_PER_TOKEN = 8
+
+# Truncation results keyed by (digest of the bounded text, budget, tokenizer loaded), so
+# character-limit results are not reused once the tokenizer arrives; values hold at most
+# budget * _MAX_CHARS_PER_TOKEN characters, never a whole file
+_truncation_cache: LRUCache = LRUCache(maxsize=1024)
+
+def _truncate_and_count(text: str, budget: int) -> Tuple[str, int]:
+	"""
+	Truncate text to at most `budget` tokens and count the tokens kept.
+	
+	Only the first budget * _MAX_CHARS_PER_TOKEN characters are encoded, so
+	a multi-MB file costs no more than a small one. Memoized so the same file
+	sized for batching, then re-truncated across scenarios and batches, is
+	encoded only once.
+	"""
+	bounded = text[:budget * _MAX_CHARS_PER_TOKEN]
+	encoding = _get_encoding()
+	key = (hashlib.blake2b(bounded.encode(), digest_size=16).digest(), budget, encoding is not None)
+	result = _truncation_cache.get(key)
+	if result is None:
+		result = _truncation_cache[key] = _encode_and_truncate(encoding, bounded, budget)
+	return result
+
+def _encode_and_truncate(encoding: Optional[tiktoken.Encoding], text: str, budget: int) -> Tuple[str, int]:
+	"""Uncached work behind _truncate_and_count"""
+	if encoding is None:
+		trimmed = text[:budget * _CHARS_PER_TOKEN]
+		return trimmed, -(-len(trimmed) // _CHARS_PER_TOKEN)
+	tokens = encoding.encode(text, disallowed_special=())
+	if len(tokens) <= budget:
+		return text, len(tokens)
+	return encoding.decode(tokens[:budget]), budget
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+	"""Truncate text to at most `budget` tokens"""
+	return _truncate_and_count(text, budget)[0]
+
+def truncated_token_count(text: str, budget: int) -> int:
+	"""Count the tokens `truncate_to_tokens(text, budget)` keeps, estimating from length when the tokenizer is unavailable"""
+	return _truncate_and_count(text, budget)[1]
+
+def _pack_by_tokens(sizes: List[int], budget: int) -> List[List[int]]:
+	"""
+	Group item indices into bins whose sizes sum to at most `budget`.
+	
+	First-fit decreasing; an item larger than the budget gets a bin of its own.
+	"""
+	bins: List[List[int]] = []
+	remaining: List[int] = []
+	for idx in sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True):
+		for bin_idx, space in enumerate(remaining):
+			if sizes[idx] <= space:
+				bins[bin_idx].append(idx)
+				remaining[bin_idx] -= sizes[idx]
+				break
+		else:
+			bins.append([idx])
+			remaining.append(budget - sizes[idx])
+	return bins
+
+# System prompts shared by every request of a kind
+_SYSTEM_SUMMARY_MSG = {
+	"role": "system",
+	"content": "You are a test case generation assistant. Generate concise test case summaries in the exact JSON format requested."
+}
+_SYSTEM_CODE_MSG = "You are a test case code generator. Generate complete, runnable test code in the specified framework."
+_SYSTEM_CODE_BATCH_MSG = "You are a test case code generator. Generate complete, runnable test code in the specified framework and return it in the exact JSON format requested."
+_SYSTEM_IMPROVED_MSG = {
+	"role": "system",
+	"content": "You are an expert software test engineer specializing in pytest. Generate complete, runnable test code without any placeholders or TODO comments."
+}
+
+def _render_summary_prompt(framework: str) -> Tuple[str, str]:
+	"""Render the fixed text before and after the source files in a summary prompt for one framework"""
+	name = framework.upper()
+	header = f"""You are a test case generation assistant.
+Given the following source code, suggest potential test cases in {name}.
+Return an array of JSON objects with:
+- id: integer (starting from 1)
+- summary: short description of the test case
+
+Source Code:
+"""
+	footer = f"""
+Generate 3-5 test case summaries for {name} in this exact JSON format:
+[
+  {{"id": 1, "summary": "Test function with valid input"}},
+  {{"id": 2, "summary": "Test function with invalid input"}},
+  {{"id": 3, "summary": "Test edge case scenario"}}
+]"""
+	return header, footer
+
+def _render_summary_batch_prompt(framework: str) -> Tuple[str, str]:
+	"""Render the fixed text before and after the source files in a batched summary prompt for one framework"""
+	name = framework.upper()
+	header = f"""You are a test case generation assistant.
+Given the following source files, suggest potential test cases in {name} for each file.
+Each file starts with a line of the form ===FILE path=<path> sha=<sha>===.
+
+Source Files:
+"""
+	footer = f"""
+Generate 3-5 test case summaries for {name} per file.
+Return only a JSON object with one entry per file, using each path exactly as given, in this exact format:
+{{"files": [
+  {{"file": "<path>", "summaries": [
+    {{"id": 1, "summary": "Test function with valid input"}},
+    {{"id": 2, "summary": "Test function with invalid input"}}
+  ]}}
+]}}"""
+	return header, footer
+
+def _render_code_instructions(framework: str) -> str:
+	"""Render the fixed code generation instructions for one framework"""
+	name = framework.upper()
+	return f"""{_SYSTEM_CODE_MSG}
+
+You are a {name} test case generator.
+Given the source code and selected test case summary, generate the complete test case code.
+
+Generate a complete, runnable {name} test case that:
+1. Imports necessary modules
+2. Sets up test fixtures if needed
+3. Implements the test logic
+4. Uses proper assertions
+5. Follows {name} best practices
+
+Special instructions when framework is SELENIUM:
+- Use Python Selenium (selenium.webdriver) with a headless Chrome WebDriver
+- Provide a pytest fixture named `driver` that sets up and tears down the WebDriver
+- Use WebDriverWait and expected_conditions; avoid arbitrary sleeps
+- Target realistic interactions (find elements, click, type, assert text/URL)
+- Return only executable pytest test code using Selenium
+
+Return only the test code, no explanations."""
+
+def _render_code_batch_instructions(framework: str) -> str:
+	"""Render the fixed batched code generation instructions for one framework"""
+	name = framework.upper()
+	return f"""{_SYSTEM_CODE_BATCH_MSG}
+
+You are a {name} test case generator.
+Given the source code and a numbered list of test case summaries, generate the complete test case code for each summary.
+
+For each summary, generate a complete, runnable {name} test case that:
+1. Imports necessary modules
+2. Sets up test fixtures if needed
+3. Implements the test logic
+4. Uses proper assertions
+5. Follows {name} best practices
+
+Special instructions when framework is SELENIUM:
+- Use Python Selenium (selenium.webdriver) with a headless Chrome WebDriver
+- Provide a pytest fixture named `driver` that sets up and tears down the WebDriver
+- Use WebDriverWait and expected_conditions; avoid arbitrary sleeps
+
+Return only a JSON array with one object per summary, using the summary number as id, in this exact format:
+[
+  {{"id": 1, "code": "<complete test code for summary 1>"}},
+  {{"id": 2, "code": "<complete test code for summary 2>"}}
+]"""
+
+# Frameworks listed by /ai/supported-frameworks; their fixed prompt text is rendered once at import
+SUPPORTED_FRAMEWORKS = ("pytest", "selenium", "jest", "unittest", "mocha", "junit")
+_SUMMARY_PROMPT_TEMPLATES = {fw: _render_summary_prompt(fw) for fw in SUPPORTED_FRAMEWORKS}
+_SUMMARY_BATCH_PROMPT_TEMPLATES = {fw: _render_summary_batch_prompt(fw) for fw in SUPPORTED_FRAMEWORKS}
+_CODE_INSTRUCTIONS = {fw: _render_code_instructions(fw) for fw in SUPPORTED_FRAMEWORKS}
+_CODE_BATCH_INSTRUCTIONS = {fw: _render_code_batch_instructions(fw) for fw in SUPPORTED_FRAMEWORKS}
+
+def _framework_template(templates: Dict[str, Any], render: Callable[[str], Any], framework: str) -> Any:
+	"""Look up pre-rendered prompt text for a framework, rendering it on demand for unlisted ones"""
+	template = templates.get(framework.lower())
+	return template if template is not None else render(framework)
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Summary returned when the model's reply has no parseable JSON array; never cached
+_PARSE_FAILURE_SUMMARY = {"id": 1, "summary": "Failed to parse AI response"}
+
+def _text_block(text: str, cached: bool = False) -> Dict[str, Any]:
+	"""Build a text content block, optionally marked as a prompt-cache breakpoint"""
+	block = {"type": "text", "text": text}
+	if cached:
+		block["cache_control"] = {"type": "ephemeral"}
+	return block
+
+def _strip_code_fence(text: str) -> str:
+	"""Return the bodies of all ``` fenced blocks in text joined together, or text unchanged when it has none"""
+	blocks = []
+	fence_start = text.find("```")
+	while fence_start != -1:
+		# Skip the opening fence line, including any language tag such as ```python
+		body_start = text.find("\n", fence_start) + 1
+		if body_start == 0:
+			break
+		body_end = text.find("```", body_start)
+		if body_end == -1:
+			# Unterminated fence, e.g. a truncated reply: keep everything after it
+			blocks.append(text[body_start:].strip())
+			break
+		blocks.append(text[body_start:body_end].strip())
+		fence_start = text.find("```", body_end + 3)
+	if not blocks:
+		return text
+	return "\n\n".join(blocks)
+
+async def _iter_sse_data(resp: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+	"""Yield the decoded JSON payload of each `data:` frame in a server-sent event stream"""
+	async for raw_line in resp.aiter_lines():
+		line = raw_line.strip()
+		if not line.startswith("data:"):
+			continue
+		data = line[5:].strip()
+		if data == "[DONE]":
+			break
+		yield orjson.loads(data)
+
+def _raise_for_stream_error(chunk: Dict[str, Any], choice: Dict[str, Any]) -> None:
+	"""Raise when a provider reports a failure inside an otherwise successful (HTTP 200) stream"""
+	error = chunk.get("error")
+	if error or choice.get("finish_reason") == "error":
+		message = error.get("message", error) if isinstance(error, dict) else error
+		raise RuntimeError(f"Provider stream failed: {message or 'finish_reason=error'}")
+
+def _message_text(message: Dict[str, Any]) -> str:
+	"""Flatten a chat message's content (plain string or content blocks) to text"""
+	content = message.get("content", "")
+	if isinstance(content, str):
+		return content
+	return "".join(block.get("text", "") for block in content)
+
 class AIService:
 	"""Service class for AI API operations (supports Gemini or OpenRouter)"""
 	
-	def __init__(self):
-		"""Initialize AI service with selected provider"""
+	def __init__(self, http: httpx.AsyncClient, cache: Optional[LLMCache] = None):
+		"""Initialize AI service with selected provider, the shared HTTP client, and a response cache"""
+		self.http = http
+		self.cache = cache if cache is not None else response_cache
 		self.provider = getattr(settings, "AI_PROVIDER", "openrouter").lower()
 		if self.provider == "gemini":
 			self.gemini_api_key = getattr(settings, "GEMINI_API_KEY", "")
@@ -34,62 +335,161 @@ class AIService:
 				raise ValueError("OPENROUTER_API_KEY is missing. Add it to backend/.env or set AI_PROVIDER=gemini")
 			logger.info("AI Service initialized with OpenRouter API")
 	
-	def _make_openrouter_request(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> Dict[str, Any]:
-		"""Make a request to OpenRouter API"""
-		if not model:
-			model = self.default_model
-		headers = {
+	@property
+	def model_name(self) -> str:
+		"""Model used for requests with the selected provider"""
+		return self.gemini_model if self.provider == "gemini" else self.default_model
+	
+	def _summary_cache_key(self, file_contents: List[FileContent], framework: str) -> str:
+		"""Cache key for test case summaries of a set of file versions"""
+		return make_cache_key(
+			kind="summaries",
+			model=self.model_name,
+			framework=framework,
+			files=[[fc.path, fc.sha, content_sha(fc.content)] for fc in file_contents]
+		)
+	
+	def _code_cache_key(self, file_content: FileContent, scenario: str, framework: str, streamed: bool = False) -> str:
+		"""Cache key for generated code of one scenario against one file version; streamed (unstripped) output is kept apart"""
+		return make_cache_key(
+			kind="code-stream" if streamed else "code",
+			model=self.model_name,
+			framework=framework,
+			file_sha=file_content.sha,
+			content_sha=content_sha(file_content.content),
+			scenario=scenario
+		)
+	
+	def _improved_cache_key(self, file_name: str, file_content: str, scenario: str, streamed: bool = False) -> str:
+		"""Cache key for improved-prompt code of one scenario against one file; streamed (unstripped) output is kept apart"""
+		return make_cache_key(
+			kind="improved-stream" if streamed else "improved",
+			model=self.model_name,
+			framework="pytest",
+			file_name=file_name,
+			content_sha=content_sha(file_content),
+			scenario=scenario
+		)
+	
+	def _openrouter_headers(self) -> Dict[str, str]:
+		"""Headers sent with every OpenRouter request"""
+		return {
 			"Authorization": f"Bearer {self.api_key}",
 			"Content-Type": "application/json",
 			"HTTP-Referer": "http://localhost:8000",
 			"X-Title": "Test Case Generator"
 		}
-		
+	
+	def _openrouter_payload(self, messages: List[Dict[str, Any]], model: Optional[str] = None, json_response: bool = False) -> Dict[str, Any]:
+		"""Build the OpenRouter chat completion payload"""
 		payload = {
-			"model": model,
+			"model": model or self.default_model,
 			"messages": messages,
 			"max_tokens": 4000,
 			"temperature": 0.7
 		}
-		
-		resp = requests.post(f"{self.base_url}/chat/completions", headers=headers, json=payload, timeout=30)
-		resp.raise_for_status()
-		return resp.json()
+		if json_response:
+			payload["response_format"] = {"type": "json_object"}
+		return payload
 	
-	def _make_gemini_request(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> Dict[str, Any]:
-		"""Make a request to Gemini Generative Language API"""
-		if not model:
-			model = self.gemini_model
-		# Convert messages to Gemini contents (simple mapping)
+	def _gemini_payload(self, messages: List[Dict[str, Any]], json_response: bool = False) -> Dict[str, Any]:
+		"""Convert chat messages to a Gemini generateContent payload (simple mapping)"""
 		contents = []
 		for m in messages:
-			text = m.get("content", "")
+			text = _message_text(m)
 			contents.append({"role": "user", "parts": [{"text": text}]})
-		url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.gemini_api_key}"
 		payload = {"contents": contents}
-		resp = requests.post(url, json=payload, timeout=30)
+		if json_response:
+			payload["generationConfig"] = {"responseMimeType": "application/json"}
+		return payload
+	
+	@retry_transient
+	async def _make_openrouter_request(self, messages: List[Dict[str, Any]], model: Optional[str] = None, json_response: bool = False) -> Dict[str, Any]:
+		"""Make a request to OpenRouter API, optionally asking for a JSON object reply"""
+		resp = await self.http.post(
+			f"{self.base_url}/chat/completions",
+			content=orjson.dumps(self._openrouter_payload(messages, model, json_response)),
+			headers=self._openrouter_headers()
+		)
 		resp.raise_for_status()
-		return resp.json()
+		return orjson.loads(resp.content)
+	
+	@retry_transient
+	async def _make_gemini_request(self, messages: List[Dict[str, Any]], model: Optional[str] = None, json_response: bool = False) -> Dict[str, Any]:
+		"""Make a request to Gemini Generative Language API, optionally asking for a JSON reply"""
+		if not model:
+			model = self.gemini_model
+		url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.gemini_api_key}"
+		resp = await self.http.post(url, content=orjson.dumps(self._gemini_payload(messages, json_response)), headers=_JSON_HEADERS)
+		resp.raise_for_status()
+		return orjson.loads(resp.content)
+	
+	async def _stream_openrouter(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> AsyncIterator[str]:
+		"""Stream a completion from OpenRouter, yielding content deltas as they arrive"""
+		payload = self._openrouter_payload(messages, model)
+		payload["stream"] = True
+		async with self.http.stream(
+			"POST",
+			f"{self.base_url}/chat/completions",
+			content=orjson.dumps(payload),
+			headers=self._openrouter_headers()
+		) as resp:
+			resp.raise_for_status()
+			async for chunk in _iter_sse_data(resp):
+				choice = (chunk.get("choices") or [{}])[0]
+				_raise_for_stream_error(chunk, choice)
+				delta = choice.get("delta", {}).get("content")
+				if delta:
+					yield delta
+	
+	async def _stream_gemini(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> AsyncIterator[str]:
+		"""Stream a completion from Gemini, yielding text parts as they arrive"""
+		if not model:
+			model = self.gemini_model
+		url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse&key={self.gemini_api_key}"
+		async with self.http.stream("POST", url, content=orjson.dumps(self._gemini_payload(messages)), headers=_JSON_HEADERS) as resp:
+			resp.raise_for_status()
+			async for chunk in _iter_sse_data(resp):
+				candidate = (chunk.get("candidates") or [{}])[0]
+				_raise_for_stream_error(chunk, candidate)
+				for part in candidate.get("content", {}).get("parts", []):
+					if part.get("text"):
+						yield part["text"]
+	
+	def _stream_completion(self, messages: List[Dict[str, Any]]) -> AsyncIterator[str]:
+		"""Stream a completion from the selected provider"""
+		if self.provider == "gemini":
+			return self._stream_gemini(messages)
+		return self._stream_openrouter(messages)
 	
 	def _extract_json_from_response(self, response_text: str) -> List[Dict[str, Any]]:
-		"""Extract JSON from AI response text"""
+		"""Extract the JSON array from AI response text"""
+		start_idx = response_text.find('[')
+		end_idx = response_text.rfind(']') + 1
 		try:
-			# Try to find JSON in the response
-			start_idx = response_text.find('[')
-			end_idx = response_text.rfind(']') + 1
-			
-			if start_idx != -1 and end_idx != -1:
-				json_str = response_text[start_idx:end_idx]
-				return json.loads(json_str)
-			else:
-				# If no JSON array found, try to parse the entire response
-				return json.loads(response_text)
-		except json.JSONDecodeError as e:
-			logger.warning(f"Failed to parse JSON from AI response: {e}")
+			if start_idx == -1 or end_idx <= start_idx:
+				raise orjson.JSONDecodeError("No JSON array in response", response_text, 0)
+			return orjson.loads(response_text[start_idx:end_idx])
+		except orjson.JSONDecodeError as e:
+			logger.warning("Failed to parse JSON from AI response: %s", e)
 			# Return a fallback response
-			return [{"id": 1, "summary": "Failed to parse AI response"}]
+			return [dict(_PARSE_FAILURE_SUMMARY)]
 	
-	def generate_test_case_summaries(self, file_contents: List[FileContent], framework: str = "pytest") -> List[Dict[str, Any]]:
+	def _extract_json_object_from_response(self, response_text: str) -> Optional[Dict[str, Any]]:
+		"""Extract the JSON object from AI response text, or None if there is none"""
+		start_idx = response_text.find('{')
+		end_idx = response_text.rfind('}') + 1
+		if start_idx == -1 or end_idx <= start_idx:
+			logger.warning("No JSON object in AI response")
+			return None
+		try:
+			parsed = orjson.loads(response_text[start_idx:end_idx])
+		except orjson.JSONDecodeError as e:
+			logger.warning("Failed to parse JSON from AI response: %s", e)
+			return None
+		return parsed if isinstance(parsed, dict) else None
+	
+	async def generate_test_case_summaries(self, file_contents: List[FileContent], framework: str = "pytest") -> List[Dict[str, Any]]:
 		"""
 		Generate test case summaries for given file contents.
 		
@@ -100,38 +500,241 @@ class AIService:
 		Returns:
 			List of test case summaries with id and summary
 		"""
-		try:
+		async def generate() -> List[Dict[str, Any]]:
 			# Prepare the prompt for test case summarization
 			prompt = self._build_summary_prompt(file_contents, framework)
 			
-			messages = [
-				{
-					"role": "system",
-					"content": "You are a test case generation assistant. Generate concise test case summaries in the exact JSON format requested."
-				},
-				{
-					"role": "user",
-					"content": prompt
-				}
-			]
+			messages = [_SYSTEM_SUMMARY_MSG, {"role": "user", "content": prompt}]
 			
 			# Make API request
 			if self.provider == "gemini":
-				resp = self._make_gemini_request(messages)
+				resp = await self._make_gemini_request(messages)
 				ai_response = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "[]")
 			else:
-				resp = self._make_openrouter_request(messages)
+				resp = await self._make_openrouter_request(messages)
 				ai_response = resp["choices"][0]["message"]["content"]
 			
 			summaries = self._extract_json_from_response(ai_response)
-			logger.info(f"Generated {len(summaries)} test case summaries for {len(file_contents)} files")
+			logger.info("Generated %s test case summaries for %s files", len(summaries), len(file_contents))
 			return summaries
+		
+		try:
+			return await self.cache.get_or_set(
+				self._summary_cache_key(file_contents, framework),
+				generate,
+				cacheable=lambda summaries: _PARSE_FAILURE_SUMMARY not in summaries
+			)
 			
 		except Exception as e:
-			logger.error(f"Failed to generate test case summaries: {e}")
+			logger.error("Failed to generate test case summaries: %s", e)
 			raise
 	
-	def generate_test_case_code(self, file_content: FileContent, summary: str, framework: str = "pytest") -> str:
+	async def _generate_summary_batch(self, file_contents: List[FileContent], framework: str) -> Dict[str, List[Dict[str, Any]]]:
+		"""
+		Summarize several files with one LLM call.
+		
+		Args:
+			file_contents: Files to summarize together
+			framework: Testing framework to target
+			
+		Returns:
+			Summaries keyed by file path; files the model skipped are absent
+		"""
+		messages = [_SYSTEM_SUMMARY_MSG, {"role": "user", "content": self._build_summary_batch_prompt(file_contents, framework)}]
+		
+		# Make API request
+		if self.provider == "gemini":
+			resp = await self._make_gemini_request(messages, json_response=True)
+			ai_response = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "{}")
+		else:
+			resp = await self._make_openrouter_request(messages, json_response=True)
+			ai_response = resp["choices"][0]["message"]["content"]
+		
+		parsed = self._extract_json_object_from_response(ai_response) or {}
+		by_path = {}
+		for entry in parsed.get("files", []):
+			if isinstance(entry, dict) and isinstance(entry.get("summaries"), list):
+				by_path[entry.get("file")] = [summary for summary in entry["summaries"] if isinstance(summary, dict)]
+		logger.info("Generated test case summaries for %s of %s files in one batch", len(by_path), len(file_contents))
+		return by_path
+	
+	async def generate_test_case_summaries_for_files(self, file_contents: List[FileContent], framework: str = "pytest") -> List[Any]:
+		"""
+		Generate test case summaries for many files with as few LLM calls as possible.
+		
+		Uncached files are packed into batches of at most MAX_BATCH_TOKENS of
+		source, each summarized by one call; batches run concurrently. Files a
+		batch reply leaves out are retried with their own request.
+		
+		Args:
+			file_contents: List of file contents to analyze
+			framework: Testing framework to target (default: pytest)
+			
+		Returns:
+			Per-file summary lists in input order, tagged with the file path; a
+			file whose request failed has its exception in place of the list
+		"""
+		semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+		cache_keys = [self._summary_cache_key([fc], framework) for fc in file_contents]
+		results: List[Any] = [await self.cache.get(key) for key in cache_keys]
+		pending = [idx for idx, cached in enumerate(results) if cached is None]
+		
+		sizes = [
+			truncated_token_count(file_contents[idx].content, SUMMARY_FILE_TOKEN_BUDGET) + _BATCH_FILE_OVERHEAD_TOKENS
+			for idx in pending
+		]
+		batches = [[pending[pos] for pos in positions] for positions in _pack_by_tokens(sizes, MAX_BATCH_TOKENS)]
+		
+		async def run_batch(indices: List[int]) -> Dict[str, List[Dict[str, Any]]]:
+			batch = [file_contents[idx] for idx in indices]
+			async with semaphore:
+				if len(batch) == 1:
+					return {batch[0].path: await self.generate_test_case_summaries(batch, framework)}
+				by_path = await self._generate_summary_batch(batch, framework)
+			for idx, fc in zip(indices, batch):
+				if fc.path in by_path:
+					await self.cache.set(cache_keys[idx], by_path[fc.path])
+			return by_path
+		
+		batch_results = await asyncio.gather(*(run_batch(indices) for indices in batches), return_exceptions=True)
+		
+		missing = []
+		for indices, by_path in zip(batches, batch_results):
+			for idx in indices:
+				if isinstance(by_path, Exception):
+					results[idx] = by_path
+				elif file_contents[idx].path in by_path:
+					results[idx] = by_path[file_contents[idx].path]
+				else:
+					missing.append(idx)
+		
+		if missing:
+			# Fall back to a single-file call for anything a batch reply missed
+			logger.warning("Batch replies missed %s files; summarizing them individually", len(missing))
+			
+			async def run_single(fc: FileContent) -> List[Dict[str, Any]]:
+				async with semaphore:
+					return await self.generate_test_case_summaries([fc], framework)
+			
+			singles = await asyncio.gather(*(run_single(file_contents[idx]) for idx in missing), return_exceptions=True)
+			for idx, summaries in zip(missing, singles):
+				results[idx] = summaries
+		
+		return [
+			result if isinstance(result, Exception)
+			else [{**summary, "file": fc.path} for summary in result if isinstance(summary, dict)]
+			for fc, result in zip(file_contents, results)
+		]
+	
+	@property
+	def batch_enabled(self) -> bool:
+		"""Whether an OpenAI-compatible Batch API is configured"""
+		return bool(settings.BATCH_API_KEY)
+	
+	def _batch_headers(self) -> Dict[str, str]:
+		"""Headers sent with every Batch API request"""
+		return {"Authorization": f"Bearer {settings.BATCH_API_KEY}"}
+	
+	async def submit_summary_batch(self, file_contents: List[FileContent], framework: str = "pytest") -> Dict[str, Any]:
+		"""
+		Submit a Batch API job with one summary request per file.
+		
+		Args:
+			file_contents: List of file contents to analyze
+			framework: Testing framework to target (default: pytest)
+			
+		Returns:
+			Batch job with job_id and status
+		"""
+		if not self.batch_enabled:
+			raise ValueError("BATCH_API_KEY is missing. Add it to backend/.env to enable batch summarization")
+		
+		# One /v1/chat/completions request per file; custom_id carries the path back
+		lines = [
+			orjson.dumps({
+				"custom_id": fc.path,
+				"method": "POST",
+				"url": "/v1/chat/completions",
+				"body": {
+					"model": settings.BATCH_MODEL,
+					"messages": [_SYSTEM_SUMMARY_MSG, {"role": "user", "content": self._build_summary_prompt([fc], framework)}],
+					"max_tokens": 4000,
+					"temperature": 0.7
+				}
+			})
+			for fc in {fc.path: fc for fc in file_contents}.values()
+		]
+		
+		upload = await self.http.post(
+			f"{settings.BATCH_API_BASE_URL}/files",
+			headers=self._batch_headers(),
+			data={"purpose": "batch"},
+			files={"file": ("summaries.jsonl", b"\n".join(lines), "application/jsonl")}
+		)
+		upload.raise_for_status()
+		
+		resp = await self.http.post(
+			f"{settings.BATCH_API_BASE_URL}/batches",
+			headers={**self._batch_headers(), **_JSON_HEADERS},
+			content=orjson.dumps({
+				"input_file_id": orjson.loads(upload.content)["id"],
+				"endpoint": "/v1/chat/completions",
+				"completion_window": "24h"
+			})
+		)
+		resp.raise_for_status()
+		batch = orjson.loads(resp.content)
+		logger.info("Submitted summary batch %s for %s files", batch["id"], len(lines))
+		return {"job_id": batch["id"], "status": batch["status"]}
+	
+	async def get_summary_batch(self, job_id: str) -> Dict[str, Any]:
+		"""
+		Get the status of a summary Batch API job, with its results once completed.
+		
+		Args:
+			job_id: Batch job ID returned by submit_summary_batch
+			
+		Returns:
+			Batch job with job_id, status, and when completed per-file summaries
+			keyed by path plus errors for files that failed
+		"""
+		resp = await self.http.get(
+			f"{settings.BATCH_API_BASE_URL}/batches/{quote(job_id, safe='')}",
+			headers=self._batch_headers()
+		)
+		resp.raise_for_status()
+		batch = orjson.loads(resp.content)
+		job = {"job_id": job_id, "status": batch["status"]}
+		if batch["status"] != "completed":
+			return job
+		
+		summaries_by_path: Dict[str, List[Dict[str, Any]]] = {}
+		errors = []
+		for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+			if not file_id:
+				continue
+			content = await self.http.get(
+				f"{settings.BATCH_API_BASE_URL}/files/{quote(file_id, safe='')}/content",
+				headers=self._batch_headers()
+			)
+			content.raise_for_status()
+			for line in content.content.splitlines():
+				if not line.strip():
+					continue
+				result = orjson.loads(line)
+				response = result.get("response") or {}
+				if result.get("error") or response.get("status_code") != 200:
+					error = result.get("error") or response.get("body", {}).get("error")
+					errors.append({"file": result.get("custom_id"), "error": str(error)})
+					continue
+				ai_response = response["body"]["choices"][0]["message"]["content"]
+				summaries_by_path[result["custom_id"]] = self._extract_json_from_response(ai_response)
+		
+		job["summaries_by_path"] = summaries_by_path
+		job["errors"] = errors
+		return job
+	
+	async def generate_test_case_code(self, file_content: FileContent, summary: str, framework: str = "pytest") -> str:
 		"""
 		Generate complete test case code for a given summary.
 		
@@ -143,37 +746,173 @@ class AIService:
 		Returns:
 			Generated test case code as string
 		"""
-		try:
-			# Prepare the prompt for code generation
-			prompt = self._build_code_prompt(file_content, summary, framework)
-			
-			messages = [
-				{
-					"role": "system",
-					"content": "You are a test case code generator. Generate complete, runnable test code in the specified framework."
-				},
-				{
-					"role": "user",
-					"content": prompt
-				}
-			]
+		async def generate() -> str:
+			# Prepare the messages for code generation
+			messages = self._build_code_messages(file_content, summary, framework)
 			
 			# Make API request
 			if self.provider == "gemini":
-				resp = self._make_gemini_request(messages)
+				resp = await self._make_gemini_request(messages)
 				generated_code = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
 			else:
-				resp = self._make_openrouter_request(messages)
+				resp = await self._make_openrouter_request(messages)
 				generated_code = resp["choices"][0]["message"]["content"]
 			
-			logger.info(f"Generated test case code for: {summary}")
-			return generated_code
+			logger.info("Generated test case code for: %s", summary)
+			return _strip_code_fence(generated_code)
+		
+		try:
+			return await self.cache.get_or_set(self._code_cache_key(file_content, summary, framework), generate)
 			
 		except Exception as e:
-			logger.error(f"Failed to generate test case code: {e}")
+			logger.error("Failed to generate test case code: %s", e)
 			raise
 	
-	def generate_test_code_improved(self, file_name: str, file_content: str, scenario: str) -> str:
+	async def stream_test_case_code(self, file_content: FileContent, summary: str, framework: str = "pytest") -> AsyncIterator[str]:
+		"""
+		Stream test case code for a given summary as the model generates it.
+		
+		Args:
+			file_content: File content to generate test for
+			summary: Test case summary to implement
+			framework: Testing framework to target (default: pytest)
+			
+		Yields:
+			Chunks of generated test case code
+		"""
+		cache_key = self._code_cache_key(file_content, summary, framework, streamed=True)
+		cached_code = await self.cache.get(cache_key)
+		if cached_code is not None:
+			logger.info("Using cached test case code for: %s", summary)
+			yield cached_code
+			return
+		
+		chunks = []
+		async for chunk in self._stream_completion(self._build_code_messages(file_content, summary, framework)):
+			chunks.append(chunk)
+			yield chunk
+		
+		# A replay must match the live stream, so the raw text is cached rather than the stripped code
+		code = "".join(chunks)
+		if code.strip():
+			await self.cache.set(cache_key, code)
+		logger.info("Streamed test case code for: %s", summary)
+	
+	async def generate_test_case_code_batch(self, file_content: FileContent, summaries: List[str], framework: str = "pytest") -> List[str]:
+		"""
+		Generate test case code for several summaries of one file in a single LLM call.
+		
+		Args:
+			file_content: File content to generate tests for
+			summaries: Test case summaries to implement
+			framework: Testing framework to target (default: pytest)
+			
+		Returns:
+			Generated test case code for each summary, in the same order
+		"""
+		if not summaries:
+			return []
+		try:
+			cache_keys = [self._code_cache_key(file_content, summary, framework) for summary in summaries]
+			codes = [await self.cache.get(key) for key in cache_keys]
+			pending = [idx for idx, code in enumerate(codes) if code is None]
+			if not pending:
+				logger.info("Using cached test case codes for %s", file_content.path)
+				return codes
+			pending_summaries = [summaries[idx] for idx in pending]
+			
+			messages = self._build_code_batch_messages(file_content, pending_summaries, framework)
+			
+			# Make API request
+			if self.provider == "gemini":
+				resp = await self._make_gemini_request(messages)
+				ai_response = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "[]")
+			else:
+				resp = await self._make_openrouter_request(messages)
+				ai_response = resp["choices"][0]["message"]["content"]
+			
+			codes_by_id = {}
+			for item in self._extract_json_from_response(ai_response):
+				if isinstance(item, dict) and isinstance(item.get("code"), str):
+					codes_by_id[item.get("id")] = _strip_code_fence(item["code"])
+			
+			for batch_id, idx in enumerate(pending, start=1):
+				code = codes_by_id.get(batch_id)
+				if code is None:
+					# Fall back to a single-summary call for anything the batch missed
+					logger.warning("Batch response missing code for summary %s; generating it individually", batch_id)
+					code = await self.generate_test_case_code(file_content, summaries[idx], framework)
+				else:
+					await self.cache.set(cache_keys[idx], code)
+				codes[idx] = code
+			
+			logger.info("Generated %s test case codes for %s in one batch", len(pending), file_content.path)
+			return codes
+			
+		except Exception as e:
+			logger.error("Failed to generate batched test case code: %s", e)
+			raise
+	
+	async def generate_test_case_code_for_files(self, items: List[Tuple[FileContent, List[str]]], framework: str = "pytest") -> List[List[str]]:
+		"""
+		Generate batched test case code for several files concurrently.
+		
+		Args:
+			items: Pairs of file content and the summaries to implement for it
+			framework: Testing framework to target (default: pytest)
+			
+		Returns:
+			Generated code lists, one per input file, in the same order
+		"""
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+		
+		async def run(file_content: FileContent, summaries: List[str]) -> List[str]:
+			async with semaphore:
+				return await self.generate_test_case_code_batch(file_content, summaries, framework)
+		
+		return await asyncio.gather(*(run(fc, summaries) for fc, summaries in items))
+	
+	async def generate_test_case_code_requests(self, requests: List[Tuple[FileContent, str, str]]) -> List[Any]:
+		"""
+		Generate code for independent (file content, summary, framework) requests.
+		
+		Requests against the same file version and framework share one
+		batched LLM call (a lone summary uses the plain single-code prompt);
+		different files are processed concurrently.
+		
+		Args:
+			requests: Code generation requests, e.g. coalesced by AsyncBatcher
+			
+		Returns:
+			Generated code per request in the same order; a request whose
+			batch failed has its exception in place of the code
+		"""
+		groups: Dict[Tuple[str, str, str, str], Tuple[FileContent, str, List[str]]] = {}
+		for file_content, summary, framework in requests:
+			key = (file_content.path, file_content.sha, content_sha(file_content.content), framework)
+			group = groups.setdefault(key, (file_content, framework, []))
+			if summary not in group[2]:
+				group[2].append(summary)
+		
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+		
+		async def run(file_content: FileContent, framework: str, summaries: List[str]) -> Dict[str, str]:
+			async with semaphore:
+				if len(summaries) == 1:
+					return {summaries[0]: await self.generate_test_case_code(file_content, summaries[0], framework)}
+				codes = await self.generate_test_case_code_batch(file_content, summaries, framework)
+			return dict(zip(summaries, codes))
+		
+		group_results = await asyncio.gather(*(run(*group) for group in groups.values()), return_exceptions=True)
+		codes_by_group = dict(zip(groups, group_results))
+		
+		results = []
+		for file_content, summary, framework in requests:
+			codes = codes_by_group[(file_content.path, file_content.sha, content_sha(file_content.content), framework)]
+			results.append(codes if isinstance(codes, Exception) else codes[summary])
+		return results
+	
+	async def generate_test_code_improved(self, file_name: str, file_content: str, scenario: str) -> str:
 		"""
 		Generate complete pytest test code using the improved prompt.
 		
@@ -185,9 +924,57 @@ class AIService:
 		Returns:
 			Generated test case code as string
 		"""
+		# Nothing reaches the caller until the stream is fully consumed, so a transient failure can restart it
+		@retry_transient
+		async def generate() -> str:
+			messages = self._build_improved_messages(file_name, file_content, scenario)
+			
+			# Consume the provider stream so no full response is buffered at the HTTP layer
+			generated_code = _strip_code_fence("".join([chunk async for chunk in self._stream_completion(messages)]))
+			
+			logger.info("Generated improved test case code for: %s", scenario)
+			return generated_code
+		
 		try:
-			# Use the improved prompt
-			prompt = f"""
+			return await self.cache.get_or_set(self._improved_cache_key(file_name, file_content, scenario), generate)
+			
+		except Exception as e:
+			logger.error("Failed to generate improved test case code: %s", e)
+			raise
+	
+	async def stream_test_code_improved(self, file_name: str, file_content: str, scenario: str) -> AsyncIterator[str]:
+		"""
+		Stream complete pytest test code using the improved prompt as the model generates it.
+		
+		Args:
+			file_name: Name of the file to generate test for
+			file_content: Content of the file
+			scenario: Test case scenario to implement
+			
+		Yields:
+			Chunks of generated test case code
+		"""
+		cache_key = self._improved_cache_key(file_name, file_content, scenario, streamed=True)
+		cached_code = await self.cache.get(cache_key)
+		if cached_code is not None:
+			logger.info("Using cached improved test case code for: %s", scenario)
+			yield cached_code
+			return
+		
+		chunks = []
+		async for chunk in self._stream_completion(self._build_improved_messages(file_name, file_content, scenario)):
+			chunks.append(chunk)
+			yield chunk
+		
+		# A replay must match the live stream, so the raw text is cached rather than the stripped code
+		code = "".join(chunks)
+		if code.strip():
+			await self.cache.set(cache_key, code)
+		logger.info("Streamed improved test case code for: %s", scenario)
+	
+	def _build_improved_messages(self, file_name: str, file_content: str, scenario: str) -> List[Dict[str, Any]]:
+		"""Build the chat messages for the improved pytest generation prompt"""
+		prompt = f"""
 You are an expert software test engineer.
 I will give you a Python source file and a specific test case scenario.
 
@@ -215,92 +1002,92 @@ The test should include:
 ```
 
 Now, generate the complete pytest test code for the above scenario.
-			"""
-
-			messages = [
-				{
-					"role": "system",
-					"content": "You are an expert software test engineer specializing in pytest. Generate complete, runnable test code without any placeholders or TODO comments."
-				},
-				{
-					"role": "user",
-					"content": prompt
-				}
-			]
-			
-			# Make API request
-			if self.provider == "gemini":
-				resp = self._make_gemini_request(messages)
-				generated_code = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-			else:
-				resp = self._make_openrouter_request(messages)
-				generated_code = resp["choices"][0]["message"]["content"]
-			
-			logger.info(f"Generated improved test case code for: {scenario}")
-			return generated_code
-			
-		except Exception as e:
-			logger.error(f"Failed to generate improved test case code: {e}")
-			raise
+		"""
+		
+		return [_SYSTEM_IMPROVED_MSG, {"role": "user", "content": prompt}]
 	
 	def _build_summary_prompt(self, file_contents: List[FileContent], framework: str) -> str:
 		"""Build the prompt for test case summarization"""
-		prompt = f"""You are a test case generation assistant.
-Given the following source code, suggest potential test cases in {framework.upper()}.
-Return an array of JSON objects with:
-- id: integer (starting from 1)
-- summary: short description of the test case
-
-Source Code:
-"""
+		header, footer = _framework_template(_SUMMARY_PROMPT_TEMPLATES, _render_summary_prompt, framework)
+		parts = [header]
 		
 		for file_content in file_contents:
-			prompt += f"\n--- File: {file_content.path} ---\n"
-			prompt += file_content.content[:2000]  # Limit content length
-			if len(file_content.content) > 2000:
-				prompt += "\n... (content truncated)"
-			prompt += "\n"
-		
-		prompt += f"\nGenerate 3-5 test case summaries for {framework.upper()} in this exact JSON format:\n"
-		prompt += """[
-  {"id": 1, "summary": "Test function with valid input"},
-  {"id": 2, "summary": "Test function with invalid input"},
-  {"id": 3, "summary": "Test edge case scenario"}
-]"""
+			parts.append(f"\n--- File: {file_content.path} ---\n")
+			trimmed = truncate_to_tokens(file_content.content, SUMMARY_FILE_TOKEN_BUDGET)
+			parts.append(trimmed)
+			if len(trimmed) < len(file_content.content):
+				parts.append("\n... (content truncated)")
+			parts.append("\n")
+		
+		parts.append(footer)
 		
-		return prompt
+		return "".join(parts)
 	
-	def _build_code_prompt(self, file_content: FileContent, summary: str, framework: str) -> str:
-		"""Build the prompt for test case code generation"""
-		prompt = f"""You are a {framework.upper()} test case generator.
-Given the following source code and selected test case summary, generate the complete test case code.
-
-Source Code:
+	def _build_summary_batch_prompt(self, file_contents: List[FileContent], framework: str) -> str:
+		"""Build the prompt for summarizing several delimited files in one call"""
+		header, footer = _framework_template(_SUMMARY_BATCH_PROMPT_TEMPLATES, _render_summary_batch_prompt, framework)
+		parts = [header]
+		
+		for file_content in file_contents:
+			parts.append(f"\n===FILE path={file_content.path} sha={file_content.sha}===\n")
+			trimmed = truncate_to_tokens(file_content.content, SUMMARY_FILE_TOKEN_BUDGET)
+			parts.append(trimmed)
+			if len(trimmed) < len(file_content.content):
+				parts.append("\n... (content truncated)")
+			parts.append("\n")
+		
+		parts.append(footer)
+		return "".join(parts)
+	
+	def _build_source_block(self, file_content: FileContent) -> str:
+		"""Build the source code section shared by all code prompts for a file"""
+		return f"""Source Code:
 --- File: {file_content.path} ---
-{file_content.content[:3000]}  # Limit content length
-
-Selected Test Case Summary:
-{summary}
-
-Generate a complete, runnable {framework.upper()} test case that:
-1. Imports necessary modules
-2. Sets up test fixtures if needed
-3. Implements the test logic
-4. Uses proper assertions
-5. Follows {framework.upper()} best practices
-
-Special instructions when framework is SELENIUM:
-- Use Python Selenium (selenium.webdriver) with a headless Chrome WebDriver
-- Provide a pytest fixture named `driver` that sets up and tears down the WebDriver
-- Use WebDriverWait and expected_conditions; avoid arbitrary sleeps
-- Target realistic interactions (find elements, click, type, assert text/URL)
-- Return only executable pytest test code using Selenium
-
-Return only the test code, no explanations."""
+{truncate_to_tokens(file_content.content, CODE_SOURCE_TOKEN_BUDGET)}
+"""
+	
+	def _build_code_messages(self, file_content: FileContent, summary: str, framework: str) -> List[Dict[str, Any]]:
+		"""
+		Build the chat messages for test case code generation.
+		
+		Stable content (instructions, then source) comes first and is marked
+		with cache_control so providers that support prompt caching can reuse
+		the prefix; only the summary varies between calls.
+		"""
+		instructions = _framework_template(_CODE_INSTRUCTIONS, _render_code_instructions, framework)
+		
+		return [
+			{"role": "system", "content": [_text_block(instructions, cached=True)]},
+			{
+				"role": "user",
+				"content": [
+					_text_block(self._build_source_block(file_content), cached=True),
+					_text_block(f"Selected Test Case Summary:\n{summary}")
+				]
+			}
+		]
+	
+	def _build_code_batch_messages(self, file_content: FileContent, summaries: List[str], framework: str) -> List[Dict[str, Any]]:
+		"""Build the chat messages for generating code for several test case summaries at once"""
+		instructions = _framework_template(_CODE_BATCH_INSTRUCTIONS, _render_code_batch_instructions, framework)
+		
+		summary_parts = ["Test Case Summaries:\n"]
+		for idx, summary in enumerate(summaries, start=1):
+			summary_parts.append(f"{idx}. {summary}\n")
+		summary_list = "".join(summary_parts)
 		
-		return prompt
+		return [
+			{"role": "system", "content": [_text_block(instructions, cached=True)]},
+			{
+				"role": "user",
+				"content": [
+					_text_block(self._build_source_block(file_content), cached=True),
+					_text_block(summary_list)
+				]
+			}
+		]
 	
-	def test_connection(self) -> Dict[str, Any]:
+	async def test_connection(self) -> Dict[str, Any]:
 		"""Perform a minimal real call to verify API key works and return output."""
 		try:
 			messages = [
@@ -308,14 +1095,14 @@ Return only the test code, no explanations."""
 				{"role": "user", "content": "Reply with the word: pong"}
 			]
 			if self.provider == "gemini":
-				resp = self._make_gemini_request(messages)
+				resp = await self._make_gemini_request(messages)
 				content = resp.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
 				model_used = self.gemini_model
 			else:
-				resp = self._make_openrouter_request(messages)
+				resp = await self._make_openrouter_request(messages)
 				content = resp.get("choices", [{}])[0].get("message", {}).get("content", "")
 				model_used = resp.get("model") or self.default_model
 			return {"ok": True, "model": model_used, "output": content}
 		except Exception as e:
-			logger.error(f"AI connection test failed: {e}")
+			logger.error("AI connection test failed: %s", e)
 			return {"ok": False, "error": str(e)}
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _fail_pending(batch: List[Tuple[Any, asyncio.Future]]) -> None:
+    """Fail every request in a batch that has not been answered yet"""
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(RuntimeError("Batcher stopped"))
+
+
+class AsyncBatcher(Generic[T, R]):
+    """
+    Coalesce concurrent requests into batches handled by one call.
+
+    Items submitted within `max_wait_ms` of the first queued item (up to
+    `max_batch_size`) are passed together to `process`, which returns one
+    result per item in order; a result that is an exception fails only its
+    own item. Batches are dispatched as tasks so a slow batch does not hold
+    up collection of the next one.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[T]], Awaitable[List[Any]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 25
+    ):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "asyncio.Queue[Tuple[T, asyncio.Future]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the background worker on the running event loop"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker, failing any requests that are still queued or in flight"""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        for task in list(self._dispatches):
+            task.cancel()
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item: T) -> R:
+        """Queue an item and wait for its result"""
+        if self._worker is None:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self) -> None:
+        """Collect queued items into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            try:
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                # Items already taken off the queue would otherwise never be answered
+                _fail_pending(batch)
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        """Run one batch and resolve each waiting request with its result"""
+        # Requesters that gave up (e.g. client disconnected) are dropped from the batch
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            results = await self.process([item for item, _ in batch])
+        except Exception as e:
+            logger.error("Batch of %s requests failed: %s", len(batch), e)
+            results = [e] * len(batch)
+        except BaseException:
+            # Cancelled (e.g. by stop()): fail the waiting requests instead of leaving them hanging
+            _fail_pending(batch)
+            raise
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -20,12 +20,12 @@ def _load_env_file():
                 logger.warning("Loaded .env using UTF-16 encoding. Consider saving as UTF-8.")
                 return
             except Exception as e:
-                logger.error(f"Failed to load .env with UTF-16: {e}")
+                logger.error("Failed to load .env with UTF-16: %s", e)
     # Fallback to default search
     try:
         load_dotenv()
     except Exception as e:
-        logger.error(f"Failed to load .env: {e}")
+        logger.error("Failed to load .env: %s", e)
 
 _load_env_file()
 
@@ -33,6 +33,10 @@ class Settings:
     # GitHub API Configuration
     GITHUB_TOKEN: str = os.getenv("GITHUB_TOKEN", "")
     GITHUB_API_BASE_URL: str = "https://api.github.com"
+    # Number of GitHub GET responses kept for ETag revalidation (304s skip the body and the rate limit)
+    GITHUB_CACHE_SIZE: int = int(os.getenv("GITHUB_CACHE_SIZE", "1024"))
+    # Browser cache lifetime for repository tree responses (seconds)
+    TREE_CACHE_MAX_AGE: int = int(os.getenv("TREE_CACHE_MAX_AGE", "60"))
     
     # OpenRouter API Configuration (for future phases)
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
@@ -47,6 +51,23 @@ class Settings:
     AI_PROVIDER: str = os.getenv("AI_PROVIDER", "openrouter").lower()
     # AI Mock Mode (set AI_MOCK_MODE=true to force mock responses)
     AI_MOCK_MODE: bool = os.getenv("AI_MOCK_MODE", "false").lower() == "true"
+    # Upper bound on concurrent LLM requests fanned out by a single API call
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    # LLM response cache: Redis URL to share it across workers (in-memory when empty) and entry lifetime in seconds
+    LLM_CACHE_REDIS_URL: str = os.getenv("LLM_CACHE_REDIS_URL", "")
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "86400"))
+    
+    # OpenAI-compatible Batch API for large summarization jobs (disabled when BATCH_API_KEY is empty)
+    BATCH_API_KEY: str = os.getenv("BATCH_API_KEY", "")
+    BATCH_API_BASE_URL: str = os.getenv("BATCH_API_BASE_URL", "https://api.openai.com/v1")
+    BATCH_MODEL: str = os.getenv("BATCH_MODEL", "gpt-4o-mini")
+    
+    # Micro-batching of concurrent /ai/generate-code requests
+    CODE_BATCH_MAX_SIZE: int = int(os.getenv("CODE_BATCH_MAX_SIZE", "16"))
+    CODE_BATCH_MAX_WAIT_MS: float = float(os.getenv("CODE_BATCH_MAX_WAIT_MS", "25"))
+    
+    # Requests declaring a larger body are rejected with 413 before it is read
+    MAX_REQUEST_BYTES: int = int(os.getenv("MAX_REQUEST_BYTES", str(10 * 1024 * 1024)))
     
     # App Configuration
     APP_NAME: str = "Test Case Generator"
@@ -1,141 +1,344 @@
-from github import Github, GithubException
 from typing import List, Optional, Dict, Any
+from urllib.parse import quote, urlencode
+from cachetools import TTLCache
+from gidgethub import BadRequest, GitHubException
+from gidgethub.abc import GitHubAPI
+import asyncio
 import base64
+import hashlib
+import http
 import logging
+import time
 
 try:
     from .config import settings
-    from .models import FileNode, FileType, RepositoryInfo, FileContent
+    from .models import FileNode, FileType, RepositoryInfo, FileContent, FlatFileTree
+    from .retry import retry_transient
 except ImportError:
     from config import settings
-    from models import FileNode, FileType, RepositoryInfo, FileContent
+    from models import FileNode, FileType, RepositoryInfo, FileContent, FlatFileTree
+    from retry import retry_transient
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on GitHub API requests in flight at once per service
+MAX_CONCURRENT_REQUESTS = 32
+
+# Longest we are willing to wait for the GitHub rate limit window to reset (seconds)
+MAX_RATE_LIMIT_WAIT = 10
+
+# Repository metadata shared across requests, keyed by (owner, repo); short TTL
+# so default branch or description changes are picked up
+_repo_cache: TTLCache = TTLCache(maxsize=128, ttl=300)
+
+# Git tree listings larger than this are turned into FileNodes off the event loop
+TREE_BUILD_THREAD_THRESHOLD = 5000
+
+# Media type that makes the Contents API return the file bytes instead of base64 JSON
+RAW_MEDIA_TYPE = "application/vnd.github.v3.raw"
+
+def _git_entry_type(entry: Dict[str, Any]) -> FileType:
+    """Map a Git tree entry to the file type reported by the Contents API"""
+    if entry["type"] == "tree":
+        return FileType.DIR
+    if entry["type"] == "commit":
+        return FileType.SUBMODULE
+    if entry.get("mode") == "120000":
+        return FileType.SYMLINK
+    return FileType.FILE
+
+def _git_blob_sha(data: bytes) -> str:
+    """Compute the Git blob SHA of file bytes, matching the SHA GitHub reports"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
 class GitHubService:
     """Service class for GitHub API operations"""
-    
-    def __init__(self):
-        """Initialize GitHub service with authentication token"""
+
+    def __init__(self, gh: GitHubAPI):
+        """Initialize GitHub service with the app's shared gidgethub client"""
         if not settings.GITHUB_TOKEN:
             raise ValueError("GitHub token is required. Please set GITHUB_TOKEN environment variable.")
-        
-        self.github = Github(settings.GITHUB_TOKEN)
+
+        self.gh = gh
+        self.base_url = settings.GITHUB_API_BASE_URL
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
         self._authenticated_user = None
-    
-    def _get_authenticated_user(self):
+
+    async def _wait_for_rate_limit(self):
+        """Back off until the rate limit window resets once the quota is exhausted"""
+        rate_limit = self.gh.rate_limit
+        if rate_limit is None or rate_limit.remaining > 0:
+            return
+        delay = rate_limit.reset_datetime.timestamp() - time.time()
+        if delay <= 0:
+            return
+        if delay > MAX_RATE_LIMIT_WAIT:
+            raise BadRequest(http.HTTPStatus.FORBIDDEN, f"GitHub API rate limit exceeded; resets in {int(delay)}s")
+        logger.warning("GitHub API rate limit exhausted; waiting %.1fs for reset", delay)
+        await asyncio.sleep(delay)
+
+    @retry_transient
+    async def _get(self, path: str, params: Optional[Dict[str, str]] = None, accept: Optional[str] = None) -> Any:
+        """
+        Make a GET request to the GitHub API.
+
+        Returns the decoded JSON body, or the body text for non-JSON media
+        types such as raw file contents (None when the body is empty).
+        Transient failures (429s, 5xx responses, transport errors) are retried
+        with backoff.
+        """
+        url = f"{path}?{urlencode(params)}" if params else path
+        async with self._semaphore:
+            await self._wait_for_rate_limit()
+            if accept is None:
+                return await self.gh.getitem(url)
+            return await self.gh.getitem(url, accept=accept)
+
+    async def _get_authenticated_user(self) -> Dict[str, Any]:
         """Get the authenticated user information"""
         if not self._authenticated_user:
             try:
-                self._authenticated_user = self.github.get_user()
-                logger.info(f"Authenticated as: {self._authenticated_user.login}")
-            except GithubException as e:
-                logger.error(f"Failed to authenticate with GitHub: {e}")
+                self._authenticated_user = await self._get("/user")
+                logger.info("Authenticated as: %s", self._authenticated_user['login'])
+            except GitHubException as e:
+                logger.error("Failed to authenticate with GitHub: %s", e)
                 raise
         return self._authenticated_user
-    
-    def get_repository_info(self, owner: str, repo_name: str) -> RepositoryInfo:
+
+    async def _get_repo(self, owner: str, repo_name: str) -> Dict[str, Any]:
+        """Get repository metadata, reusing a recently fetched copy when available"""
+        key = (owner, repo_name)
+        repo = _repo_cache.get(key)
+        if repo is None:
+            repo = await self._get(f"/repos/{owner}/{repo_name}")
+            _repo_cache[key] = repo
+        return repo
+
+    async def get_repository_info(self, owner: str, repo_name: str) -> RepositoryInfo:
         """Get repository information"""
         try:
-            repo = self.github.get_repo(f"{owner}/{repo_name}")
+            repo = await self._get_repo(owner, repo_name)
             return RepositoryInfo(
                 owner=owner,
                 name=repo_name,
-                full_name=repo.full_name,
-                description=repo.description,
-                default_branch=repo.default_branch
+                full_name=repo["full_name"],
+                description=repo.get("description"),
+                default_branch=repo["default_branch"]
             )
-        except GithubException as e:
-            logger.error(f"Failed to get repository info for {owner}/{repo_name}: {e}")
+        except GitHubException as e:
+            logger.error("Failed to get repository info for %s/%s: %s", owner, repo_name, e)
             raise
-    
-    def get_file_tree(self, owner: str, repo_name: str, path: str = "") -> List[FileNode]:
-        """Get file tree for a repository path"""
+
+    async def get_file_tree(self, owner: str, repo_name: str, path: str = "", ref: Optional[str] = None) -> List[FileNode]:
+        """
+        Get file tree for a repository path.
+
+        Uses a single recursive Git Trees API call and builds the nested tree
+        locally; falls back to walking the Contents API when GitHub truncates
+        the listing for very large repositories.
+        """
         try:
-            repo = self.github.get_repo(f"{owner}/{repo_name}")
-            
-            if path:
-                contents = repo.get_contents(path)
-            else:
-                contents = repo.get_contents("")
-            
-            file_nodes = []
-            
-            for content in contents:
-                node = FileNode(
-                    name=content.name,
-                    path=content.path,
-                    type=FileType(content.type),
-                    size=getattr(content, 'size', None),
-                    sha=content.sha,
-                    url=content.url,
-                    children=None
-                )
-                
-                # If it's a directory, recursively get its contents
-                if content.type == "dir":
-                    try:
-                        children = self.get_file_tree(owner, repo_name, content.path)
-                        node.children = children
-                    except Exception as e:
-                        logger.warning(f"Failed to get contents for directory {content.path}: {e}")
-                        node.children = []
-                
-                file_nodes.append(node)
-            
-            return file_nodes
-            
-        except GithubException as e:
-            logger.error(f"Failed to get file tree for {owner}/{repo_name}/{path}: {e}")
+            if not ref:
+                ref = (await self._get_repo(owner, repo_name))["default_branch"]
+
+            tree = await self._get(f"/repos/{owner}/{repo_name}/git/trees/{quote(ref, safe='')}", params={"recursive": "1"})
+            if tree.get("truncated"):
+                logger.warning("Git tree for %s/%s is truncated; walking directories instead", owner, repo_name)
+                return await self._get_contents_tree(owner, repo_name, path, ref)
+
+            entries = tree.get("tree", [])
+            if len(entries) > TREE_BUILD_THREAD_THRESHOLD:
+                return await asyncio.get_running_loop().run_in_executor(None, self._build_tree, owner, repo_name, ref, entries, path)
+            return self._build_tree(owner, repo_name, ref, entries, path)
+
+        except GitHubException as e:
+            logger.error("Failed to get file tree for %s/%s/%s: %s", owner, repo_name, path, e)
+            raise
+
+    async def get_flat_file_tree(self, owner: str, repo_name: str, ref: Optional[str] = None) -> FlatFileTree:
+        """
+        Get the whole repository tree as parallel arrays.
+
+        Built straight from the recursive Git Trees API listing, which is
+        already flat; `parents` holds the index of each entry's directory,
+        or -1 for top-level entries.
+        """
+        try:
+            if not ref:
+                ref = (await self._get_repo(owner, repo_name))["default_branch"]
+
+            tree = await self._get(f"/repos/{owner}/{repo_name}/git/trees/{quote(ref, safe='')}", params={"recursive": "1"})
+            if tree.get("truncated"):
+                logger.warning("Git tree for %s/%s is truncated; walking directories instead", owner, repo_name)
+                return self._flatten_nodes(await self._get_contents_tree(owner, repo_name, ref=ref))
+
+            entries = tree.get("tree", [])
+            paths = [entry["path"] for entry in entries]
+            index_by_path = {entry_path: idx for idx, entry_path in enumerate(paths)}
+            split_paths = [entry_path.rpartition("/") for entry_path in paths]
+            return FlatFileTree(
+                names=[name for _, _, name in split_paths],
+                paths=paths,
+                types=[_git_entry_type(entry) for entry in entries],
+                shas=[entry["sha"] for entry in entries],
+                sizes=[entry.get("size", 0) for entry in entries],
+                parents=[index_by_path.get(parent_path, -1) for parent_path, _, _ in split_paths]
+            )
+
+        except GitHubException as e:
+            logger.error("Failed to get flat file tree for %s/%s: %s", owner, repo_name, e)
             raise
-    
-    def get_file_content(self, owner: str, repo_name: str, file_path: str) -> FileContent:
+
+    def _flatten_nodes(self, nodes: List[FileNode]) -> FlatFileTree:
+        """Convert nested FileNodes into the flat parallel-array layout"""
+        ordered: List[FileNode] = []
+        parents: List[int] = []
+        stack = [(node, -1) for node in reversed(nodes)]
+        while stack:
+            node, parent = stack.pop()
+            idx = len(ordered)
+            ordered.append(node)
+            parents.append(parent)
+            stack.extend((child, idx) for child in reversed(node.children or []))
+        return FlatFileTree(
+            names=[node.name for node in ordered],
+            paths=[node.path for node in ordered],
+            types=[node.type for node in ordered],
+            shas=[node.sha for node in ordered],
+            sizes=[node.size for node in ordered],
+            parents=parents
+        )
+
+    def _build_tree(self, owner: str, repo_name: str, ref: str, entries: List[Dict[str, Any]], path: str = "") -> List[FileNode]:
+        """Build nested FileNodes from the flat entry list of a recursive Git tree"""
+        prefix = f"{path.strip('/')}/" if path.strip("/") else ""
+        nodes: Dict[str, FileNode] = {}
+
+        for entry in entries:
+            entry_path = entry["path"]
+            if not entry_path.startswith(prefix):
+                continue
+            node_type = _git_entry_type(entry)
+            # Fields come straight from GitHub, so skip validation
+            nodes[entry_path] = FileNode.model_construct(
+                name=entry_path.rsplit("/", 1)[-1],
+                path=entry_path,
+                type=node_type,
+                size=entry.get("size", 0),
+                sha=entry["sha"],
+                url=f"{self.base_url}/repos/{owner}/{repo_name}/contents/{quote(entry_path)}?ref={quote(ref, safe='')}",
+                children=[] if node_type == FileType.DIR else None
+            )
+
+        root_nodes = []
+        for entry_path, node in nodes.items():
+            nested = "/" in entry_path[len(prefix):]
+            parent = nodes.get(entry_path.rsplit("/", 1)[0]) if nested else None
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                root_nodes.append(node)
+
+        return root_nodes
+
+    async def _get_contents_tree(self, owner: str, repo_name: str, path: str = "", ref: Optional[str] = None) -> List[FileNode]:
+        """Get file tree at ref by walking the Contents API, fetching subdirectories concurrently"""
+        contents = await self._get(f"/repos/{owner}/{repo_name}/contents/{quote(path)}", params={"ref": ref} if ref else None)
+        if isinstance(contents, dict):
+            contents = [contents]
+
+        file_nodes = [
+            FileNode.model_construct(
+                name=content["name"],
+                path=content["path"],
+                type=FileType(content["type"]),
+                size=content.get("size"),
+                sha=content["sha"],
+                url=content["url"],
+                children=None
+            )
+            for content in contents
+        ]
+
+        # Recursively get the contents of all directories at this level at once
+        dir_nodes = [node for node in file_nodes if node.type == FileType.DIR]
+        children_lists = await asyncio.gather(
+            *(self._get_contents_tree(owner, repo_name, node.path, ref) for node in dir_nodes),
+            return_exceptions=True
+        )
+        for node, children in zip(dir_nodes, children_lists):
+            if isinstance(children, Exception):
+                logger.warning("Failed to get contents for directory %s: %s", node.path, children)
+                node.children = []
+            else:
+                node.children = children
+
+        return file_nodes
+
+    async def get_file_content(self, owner: str, repo_name: str, file_path: str) -> FileContent:
         """Get content of a specific file"""
         try:
-            repo = self.github.get_repo(f"{owner}/{repo_name}")
-            content = repo.get_contents(file_path)
-            
-            # Decode content based on encoding
-            if content.encoding == "base64":
-                decoded_content = base64.b64decode(content.content).decode('utf-8')
+            contents_path = f"/repos/{owner}/{repo_name}/contents/{quote(file_path)}"
+            try:
+                # Ask for the raw bytes: one call, no base64 payload to transfer or decode
+                raw = await self._get(contents_path, accept=RAW_MEDIA_TYPE)
+            except UnicodeDecodeError:
+                # gidgethub decodes raw bodies as UTF-8; fetch binary files as base64 JSON instead
+                meta = await self._get(contents_path)
+                if not isinstance(meta, dict) or "content" not in meta:
+                    raise BadRequest(http.HTTPStatus.BAD_REQUEST, f"{file_path} is not a file")
+                body = base64.b64decode(meta["content"])
+                content = body.decode('utf-8', errors='replace')
             else:
-                decoded_content = content.content
-            
+                if isinstance(raw, (list, dict)):
+                    # Directories come back as a JSON listing even with the raw media type
+                    raise BadRequest(http.HTTPStatus.BAD_REQUEST, f"{file_path} is not a file")
+                content = raw or ""
+                body = content.encode('utf-8')
+
+            # Size and SHA follow from the bytes, so no separate metadata call is needed
             return FileContent(
-                path=content.path,
-                content=decoded_content,
-                encoding=content.encoding,
-                size=content.size,
-                sha=content.sha
+                path=file_path.strip("/"),
+                content=content,
+                encoding="utf-8",
+                size=len(body),
+                sha=_git_blob_sha(body)
             )
-            
-        except GithubException as e:
-            logger.error(f"Failed to get file content for {owner}/{repo_name}/{file_path}: {e}")
+
+        except GitHubException as e:
+            logger.error("Failed to get file content for %s/%s/%s: %s", owner, repo_name, file_path, e)
             raise
-    
-    def get_multiple_file_contents(self, owner: str, repo_name: str, file_paths: List[str]) -> List[FileContent]:
-        """Get contents of multiple files"""
+
+    async def get_multiple_file_contents(self, owner: str, repo_name: str, file_paths: List[str]) -> List[FileContent]:
+        """Get contents of multiple files concurrently, fetching each distinct path once"""
+        unique_paths = list(dict.fromkeys(file_paths))
+        results = await asyncio.gather(
+            *(self.get_file_content(owner, repo_name, file_path) for file_path in unique_paths),
+            return_exceptions=True
+        )
+        result_by_path = dict(zip(unique_paths, results))
+
         file_contents = []
-        
         for file_path in file_paths:
-            try:
-                content = self.get_file_content(owner, repo_name, file_path)
-                file_contents.append(content)
-            except Exception as e:
-                logger.error(f"Failed to get content for {file_path}: {e}")
+            result = result_by_path[file_path]
+            if isinstance(result, Exception):
+                logger.error("Failed to get content for %s: %s", file_path, result)
                 # Continue with other files even if one fails
                 continue
-        
+            file_contents.append(result)
+
         return file_contents
-    
-    def test_connection(self) -> bool:
+
+    async def test_connection(self) -> bool:
         """Test GitHub API connection"""
         try:
-            user = self._get_authenticated_user()
-            logger.info(f"GitHub connection successful. Authenticated as: {user.login}")
+            # Always hit the API; a memoized user would report success after the token was revoked
+            user = await self._get("/user")
+            self._authenticated_user = user
+            logger.info("GitHub connection successful. Authenticated as: %s", user['login'])
             return True
         except Exception as e:
-            logger.error(f"GitHub connection failed: {e}")
+            logger.error("GitHub connection failed: %s", e)
             return False
@@ -0,0 +1,210 @@
+import functools
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Protocol, Tuple
+
+import orjson
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Default lifetime of a cached LLM response (seconds)
+DEFAULT_TTL = 86400
+
+# Bump whenever prompt wording changes so stale responses are not served
+PROMPT_VERSION = "1"
+
+
+def make_cache_key(**fields: Any) -> str:
+    """
+    Build a deterministic cache key from the inputs that determine an LLM response.
+
+    Args:
+        fields: Values such as model, framework, file SHA, and scenario
+
+    Returns:
+        Hex digest identifying the combination of fields
+    """
+    payload = orjson.dumps({**fields, "prompt_v": PROMPT_VERSION}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+
+@functools.lru_cache(maxsize=256)
+def content_sha(content: str) -> str:
+    """Hash source text so keys change when content differs from its reported SHA"""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class CacheBackend(Protocol):
+    """Storage used by LLMCache"""
+
+    name: str
+
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        ...
+
+    async def clear(self) -> None:
+        ...
+
+
+class InMemoryBackend:
+    """In-process LRU store with per-entry expiry"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis store shared by every worker process; values are stored as JSON"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "llm:"):
+        if redis_asyncio is None:
+            raise RuntimeError("The redis package is required for the Redis cache backend")
+        self.client = redis_asyncio.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else orjson.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(self.prefix + key, orjson.dumps(value), ex=ttl)
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+
+class LLMCache:
+    """Cache for LLM responses that tracks hit and miss counts"""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: int = DEFAULT_TTL):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss; backend failures count as misses"""
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("LLM cache read failed: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store value under key; backend failures are logged and ignored"""
+        try:
+            await self.backend.set(key, value, ttl or self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("LLM cache write failed: %s", e)
+
+    async def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Return the cached value for key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key from make_cache_key
+            factory: Coroutine function producing the value on a miss
+            ttl: Lifetime of a newly stored value (default: the cache TTL)
+            cacheable: Optional check that rejects values which should not be stored
+
+        Returns:
+            The cached or freshly computed value
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+        value = await factory()
+        if cacheable is None or cacheable(value):
+            await self.set(key, value, ttl)
+        return value
+
+    async def clear(self) -> None:
+        """Drop all cached entries"""
+        await self.backend.clear()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for health reporting"""
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+        if isinstance(self.backend, InMemoryBackend):
+            stats["size"] = len(self.backend)
+        return stats
+
+
+def _default_backend() -> CacheBackend:
+    """Use Redis when LLM_CACHE_REDIS_URL is set and available, otherwise memory"""
+    if settings.LLM_CACHE_REDIS_URL:
+        try:
+            return RedisBackend(settings.LLM_CACHE_REDIS_URL)
+        except RuntimeError as e:
+            logger.warning("%s; falling back to the in-memory LLM cache", e)
+    return InMemoryBackend()
+
+
+# Process-wide cache shared by all AIService instances
+response_cache = LLMCache(_default_backend(), ttl=settings.LLM_CACHE_TTL)
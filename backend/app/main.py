@@ -1,14 +1,22 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from contextlib import asynccontextmanager
+from cachetools import LRUCache
+import gidgethub.httpx
+import httpx
 import logging
 import uvicorn
 
 try:
     from .config import settings
+    from .ai_service import start_encoding_load
+    from .batcher import AsyncBatcher
     from .routes import github_routes, ai_routes
 except ImportError:
     from config import settings
+    from ai_service import start_encoding_load
+    from batcher import AsyncBatcher
     from routes import github_routes, ai_routes
 
 # Configure logging
@@ -18,15 +26,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared HTTP client and code batcher on startup and close them on shutdown"""
+    # Loading the tokenizer can download its vocabulary with no timeout; do it in the
+    # background so startup never waits on it (requests use character limits until then)
+    start_encoding_load()
+    # One pooled HTTP/2 client for GitHub and the LLM providers; concurrent
+    # requests to a host multiplex over its kept-alive connections
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=2000, max_keepalive_connections=1000),
+        timeout=httpx.Timeout(60.0)
+    )
+    app.state.github_api = gidgethub.httpx.GitHubAPI(
+        app.state.http,
+        "test-case-gen",
+        oauth_token=settings.GITHUB_TOKEN or None,
+        # gidgethub replays cached bodies on 304s, sending If-None-Match from each entry's ETag
+        cache=LRUCache(maxsize=settings.GITHUB_CACHE_SIZE),
+        base_url=settings.GITHUB_API_BASE_URL
+    )
+    # Services are created on first use (see get_ai_service/get_github_service) and reused
+    # across requests; drop any bound to a client from a previous run
+    app.state.ai_service = None
+    app.state.github_service = None
+    # Coalesces concurrent /ai/generate-code requests into batched LLM calls
+    app.state.code_batcher = AsyncBatcher(
+        lambda requests: ai_routes.shared_ai_service(app).generate_test_case_code_requests(requests),
+        max_batch_size=settings.CODE_BATCH_MAX_SIZE,
+        max_wait_ms=settings.CODE_BATCH_MAX_WAIT_MS
+    )
+    app.state.code_batcher.start()
+    try:
+        yield
+    finally:
+        await app.state.code_batcher.stop()
+        await app.state.http.aclose()
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="Test Case Generator - AI-powered test case generation from GitHub repositories",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Reject oversized payloads before their body is read and parsed; registered
+# before CORS so the 413 still carries CORS headers
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """Reject requests whose declared Content-Length exceeds MAX_REQUEST_BYTES"""
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.MAX_REQUEST_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body too large (limit {settings.MAX_REQUEST_BYTES} bytes)"}
+        )
+    return await call_next(request)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,7 +101,7 @@ app.add_middleware(
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler for unhandled errors"""
-    logger.error(f"Unhandled exception: {exc}")
+    logger.error("Unhandled exception: %s", exc)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error", "detail": str(exc)}
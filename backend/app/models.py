@@ -21,6 +21,15 @@ class FileNode(BaseModel):
     # For directories, we'll populate children
     children: Optional[List['FileNode']] = Field(None, description="Child files/directories")
 
+class FlatFileTree(BaseModel):
+    """Repository tree as parallel arrays, one index per file or directory"""
+    names: List[str] = Field(..., description="Name of each entry")
+    paths: List[str] = Field(..., description="Full path of each entry from repository root")
+    types: List[FileType] = Field(..., description="Type of each entry")
+    shas: List[str] = Field(..., description="Git SHA of each entry")
+    sizes: List[Optional[int]] = Field(..., description="Size in bytes of each entry (for files)")
+    parents: List[int] = Field(..., description="Index of each entry's parent directory, or -1 at the root")
+
 class RepositoryInfo(BaseModel):
     """Repository information"""
     owner: str = Field(..., description="Repository owner")
@@ -35,6 +44,12 @@ class FileTreeResponse(BaseModel):
     files: List[FileNode] = Field(..., description="List of files and directories")
     total_count: int = Field(..., description="Total number of files and directories")
 
+class FlatFileTreeResponse(BaseModel):
+    """Response model for the flat file tree endpoint"""
+    repository: RepositoryInfo = Field(..., description="Repository information")
+    tree: FlatFileTree = Field(..., description="Flat file tree")
+    total_count: int = Field(..., description="Total number of files and directories")
+
 class FileContentRequest(BaseModel):
     """Request model for getting file contents"""
     owner: str = Field(..., description="Repository owner")
@@ -72,5 +87,34 @@ class GenerateTestResponse(BaseModel):
     file_name: str = Field(..., description="Name of the file")
     scenario: str = Field(..., description="Test case scenario")
 
+class GenerateCodeBatchItem(BaseModel):
+    """A file and the test case summaries to generate code for"""
+    file_content: FileContent = Field(..., description="File content to generate tests for")
+    summaries: List[str] = Field(..., description="Test case summaries to implement")
+
+class GenerateCodeBatchRequest(BaseModel):
+    """Request model for batched test case code generation"""
+    items: List[GenerateCodeBatchItem] = Field(..., description="Files and their test case summaries")
+    framework: str = Field("pytest", description="Testing framework to target")
+
+class GeneratedCodeResult(BaseModel):
+    """Generated test case code for one file"""
+    file_path: str = Field(..., description="Path of the file the tests target")
+    summaries: List[str] = Field(..., description="Test case summaries that were implemented")
+    codes: List[str] = Field(..., description="Generated test case code, one per summary")
+
+class GenerateCodeBatchResponse(BaseModel):
+    """Response model for batched test case code generation"""
+    results: List[GeneratedCodeResult] = Field(..., description="Generated code per file")
+    framework: str = Field(..., description="Testing framework targeted")
+    total_count: int = Field(..., description="Total number of generated test cases")
+
+class SummaryBatchJobResponse(BaseModel):
+    """Status and, once finished, results of a Batch API summarization job"""
+    job_id: str = Field(..., description="Batch job ID to poll")
+    status: str = Field(..., description="Batch job status as reported by the provider")
+    summaries: Optional[List[Dict[str, Any]]] = Field(None, description="Test case summaries with id, summary and file, once completed")
+    errors: List[Dict[str, Any]] = Field(default_factory=list, description="Files that could not be summarized")
+
 # Update forward references
 FileNode.model_rebuild()
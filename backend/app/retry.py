@@ -0,0 +1,65 @@
+import logging
+from typing import Optional
+
+import httpx
+from gidgethub import HTTPException as GitHubHTTPException
+from tenacity import (
+    RetryCallState,
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Total attempts for one call, including the first
+RETRY_ATTEMPTS = 4
+
+# Longest Retry-After we honour before retrying (seconds); longer waits are capped
+MAX_RETRY_AFTER = 10
+
+_backoff = wait_exponential_jitter(initial=0.25, max=4)
+
+
+def _status_and_headers(exc: BaseException) -> Optional[tuple]:
+    """Status code and headers of an HTTP error response, or None for other errors"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code, exc.response.headers
+    if isinstance(exc, GitHubHTTPException):
+        return exc.status_code, exc.headers
+    return None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failed HTTP call is worth retrying: transport errors, 429s and 5xx responses"""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    response = _status_and_headers(exc)
+    if response is None:
+        return False
+    status_code = response[0]
+    return status_code == 429 or status_code >= 500
+
+
+def _wait(retry_state: RetryCallState) -> float:
+    """Honour the server's Retry-After when it sends one, else back off exponentially with jitter"""
+    response = _status_and_headers(retry_state.outcome.exception())
+    if response is not None:
+        try:
+            return min(max(float(response[1].get("retry-after", "")), 0.0), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+    return _backoff(retry_state)
+
+
+# Retries a coroutine on transient HTTP failures; other errors, and the last
+# transient one, propagate unchanged
+retry_transient = retry(
+    retry=retry_if_exception(is_transient),
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=_wait,
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
@@ -1,13 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncGenerator, AsyncIterator, List, Dict, Any
 import logging
+import orjson
 
 try:
-    from ..ai_service import AIService
-    from ..models import FileContent, FileContentRequest, GenerateTestRequest, GenerateTestResponse
+    from ..ai_service import AIService, SUPPORTED_FRAMEWORKS
+    from ..llm_cache import response_cache
+    from ..models import (
+        FileContent,
+        GenerateTestRequest,
+        GenerateTestResponse,
+        GenerateCodeBatchRequest,
+        GenerateCodeBatchResponse,
+        GeneratedCodeResult,
+        SummaryBatchJobResponse
+    )
 except ImportError:
-    from ai_service import AIService
-    from models import FileContent, FileContentRequest, GenerateTestRequest, GenerateTestResponse
+    from ai_service import AIService, SUPPORTED_FRAMEWORKS
+    from llm_cache import response_cache
+    from models import (
+        FileContent,
+        GenerateTestRequest,
+        GenerateTestResponse,
+        GenerateCodeBatchRequest,
+        GenerateCodeBatchResponse,
+        GeneratedCodeResult,
+        SummaryBatchJobResponse
+    )
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,51 +35,132 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="/ai", tags=["AI"])
 
-def get_ai_service() -> AIService:
-    """Dependency to get AI service instance"""
-    return AIService()
+# Display details for each framework in ai_service.SUPPORTED_FRAMEWORKS; a framework
+# added there without an entry here fails at import rather than going unlisted
+_FRAMEWORK_DETAILS = {
+    "pytest": ("Python testing framework", "Python"),
+    "selenium": ("Python UI automation testing with Selenium", "Python"),
+    "jest": ("JavaScript testing framework", "JavaScript/TypeScript"),
+    "unittest": ("Python built-in testing framework", "Python"),
+    "mocha": ("JavaScript testing framework", "JavaScript/TypeScript"),
+    "junit": ("Java testing framework", "Java"),
+}
+_SUPPORTED_FRAMEWORKS = [
+    {"name": name, "description": _FRAMEWORK_DETAILS[name][0], "language": _FRAMEWORK_DETAILS[name][1]}
+    for name in SUPPORTED_FRAMEWORKS
+]
+# Supported frameworks never change at runtime, so the response body is serialized once
+_SUPPORTED_FRAMEWORKS_BODY = orjson.dumps({
+    "frameworks": _SUPPORTED_FRAMEWORKS,
+    "total_count": len(_SUPPORTED_FRAMEWORKS)
+})
 
-@router.post("/summarize-tests")
-async def summarize_tests(
-    request: FileContentRequest,
+def shared_ai_service(app: FastAPI) -> AIService:
+    """Get the app's AI service, created on first use and bound to the shared HTTP client"""
+    ai_service = getattr(app.state, "ai_service", None)
+    if ai_service is None:
+        ai_service = app.state.ai_service = AIService(http=app.state.http)
+    return ai_service
+
+def get_ai_service(request: Request) -> AIService:
+    """Dependency to get the app's shared AI service instance"""
+    return shared_ai_service(request.app)
+
+def _number_summaries(summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Renumber summaries so ids stay unique across files (per-file ids each start at 1)"""
+    for idx, summary in enumerate(summaries, start=1):
+        summary["id"] = idx
+    return summaries
+
+def _sse_event(data: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event frame"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def _sse_stream(chunks: AsyncGenerator[str, None], description: str) -> AsyncIterator[bytes]:
+    """Forward generated chunks as SSE frames, reporting failures in-band"""
+    try:
+        async for chunk in chunks:
+            yield _sse_event({"delta": chunk})
+    except Exception as e:
+        # The response has already started, so the error is sent as an event
+        logger.error("Error streaming %s: %s", description, e)
+        yield _sse_event({"error": f"Failed to generate {description}: {str(e)}"})
+    finally:
+        # Close the inner stream, and with it the upstream completion, on every
+        # exit path, including this generator being closed mid-stream
+        await chunks.aclose()
+    yield b"data: [DONE]\n\n"
+
+@router.post("/summarize-tests-with-content")
+async def summarize_tests_with_content(
+    file_contents: List[FileContent],
     framework: str = "pytest",
     ai_service: AIService = Depends(get_ai_service)
 ):
     """
     Generate test case summaries for the given file contents.
+    This endpoint accepts the actual file contents directly and
+    summarizes them in concurrent, token-bounded batches. Large jobs can
+    opt in to the Batch API through /summarize-tests-batch instead.
     
     Args:
-        request: FileContentRequest with owner, repo, and file paths
+        file_contents: List of file contents to analyze
         framework: Testing framework to target (default: pytest)
         ai_service: AI service instance
     
     Returns:
-        List of test case summaries with id and summary
+        List of test case summaries with id, summary and file, plus any per-file errors
     """
     try:
-        # This endpoint requires file contents to be fetched from GitHub first
-        # For now, return an error indicating this endpoint needs file contents
-        raise HTTPException(
-            status_code=400,
-            detail="This endpoint requires file contents. Use /summarize-tests-with-content instead."
-        )
+        if not file_contents:
+            raise HTTPException(
+                status_code=400,
+                detail="No file contents provided"
+            )
+        
+        # Generate test case summaries for all files concurrently
+        results = await ai_service.generate_test_case_summaries_for_files(file_contents, framework)
         
+        summaries = []
+        errors = []
+        for file_content, result in zip(file_contents, results):
+            if isinstance(result, Exception):
+                logger.error("Error generating test case summaries for %s: %s", file_content.path, result)
+                errors.append({"file": file_content.path, "error": str(result)})
+                continue
+            summaries.extend(result)
+        
+        # Partial results are still useful; only fail when every file failed
+        if len(errors) == len(file_contents):
+            raise next(result for result in results if isinstance(result, Exception))
+        
+        return {
+            "summaries": _number_summaries(summaries),
+            "framework": framework,
+            "total_count": len(summaries),
+            "files_analyzed": len(file_contents),
+            "errors": errors
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating test case summaries: {e}")
+        logger.error("Error generating test case summaries: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate test case summaries: {str(e)}"
         )
 
-@router.post("/summarize-tests-with-content")
-async def summarize_tests_with_content(
+@router.post("/summarize-tests-batch", response_model=SummaryBatchJobResponse)
+async def submit_summarize_tests_batch(
     file_contents: List[FileContent],
     framework: str = "pytest",
     ai_service: AIService = Depends(get_ai_service)
 ):
     """
-    Generate test case summaries for the given file contents.
-    This endpoint accepts the actual file contents directly.
+    Submit a Batch API job summarizing each of the given files.
+    Batch jobs cost less and avoid per-request rate limits but complete
+    asynchronously; poll /summarize-tests-batch/{job_id} for the results.
     
     Args:
         file_contents: List of file contents to analyze
@@ -67,7 +168,7 @@ async def summarize_tests_with_content(
         ai_service: AI service instance
     
     Returns:
-        List of test case summaries with id and summary
+        SummaryBatchJobResponse with the job ID and initial status
     """
     try:
         if not file_contents:
@@ -76,38 +177,77 @@ async def summarize_tests_with_content(
                 detail="No file contents provided"
             )
         
-        # Generate test case summaries using AI service
-        summaries = ai_service.generate_test_case_summaries(file_contents, framework)
+        job = await ai_service.submit_summary_batch(file_contents, framework)
+        return SummaryBatchJobResponse(**job)
         
-        return {
-            "summaries": summaries,
-            "framework": framework,
-            "total_count": len(summaries),
-            "files_analyzed": len(file_contents)
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error submitting summary batch: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to submit summary batch: {str(e)}"
+        )
+
+@router.get("/summarize-tests-batch/{job_id}", response_model=SummaryBatchJobResponse)
+async def get_summarize_tests_batch(
+    job_id: str,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Get the status of a summary batch job, with its summaries once completed.
+    
+    Args:
+        job_id: Batch job ID returned when the job was submitted
+        ai_service: AI service instance
+    
+    Returns:
+        SummaryBatchJobResponse with status, and summaries and errors when completed
+    """
+    try:
+        job = await ai_service.get_summary_batch(job_id)
+        if "summaries_by_path" not in job:
+            return SummaryBatchJobResponse(**job)
+        
+        summaries = [
+            {**summary, "file": path}
+            for path, file_summaries in job["summaries_by_path"].items()
+            for summary in file_summaries
+            if isinstance(summary, dict)
+        ]
+        return SummaryBatchJobResponse(
+            job_id=job["job_id"],
+            status=job["status"],
+            summaries=_number_summaries(summaries),
+            errors=job["errors"]
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating test case summaries: {e}")
+        logger.error("Error getting summary batch %s: %s", job_id, e)
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to generate test case summaries: {str(e)}"
+            detail=f"Failed to get summary batch: {str(e)}"
         )
 
 @router.post("/generate-code")
 async def generate_test_code(
+    request: Request,
     file_content: FileContent,
     summary: str,
-    framework: str = "pytest",
-    ai_service: AIService = Depends(get_ai_service)
+    framework: str = "pytest"
 ):
     """
     Generate complete test case code for a given summary.
+    Concurrent requests are coalesced by the app's code batcher, so
+    summaries for the same file share one LLM call.
     
     Args:
+        request: Incoming request, used to reach the shared code batcher
         file_content: File content to generate test for
         summary: Test case summary to implement
         framework: Testing framework to target (default: pytest)
-        ai_service: AI service instance
     
     Returns:
         Generated test case code
@@ -119,8 +259,8 @@ async def generate_test_code(
                 detail="Test case summary is required"
             )
         
-        # Generate test case code using AI service
-        generated_code = ai_service.generate_test_case_code(file_content, summary, framework)
+        # Generate test case code through the micro-batcher
+        generated_code = await request.app.state.code_batcher.submit((file_content, summary, framework))
         
         return {
             "code": generated_code,
@@ -129,8 +269,95 @@ async def generate_test_code(
             "file_path": file_content.path
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating test case code: {e}")
+        logger.error("Error generating test case code: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate test case code: {str(e)}"
+        )
+
+@router.post("/generate-code/stream")
+async def stream_test_code(
+    file_content: FileContent,
+    summary: str,
+    framework: str = "pytest",
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Stream test case code for a given summary as server-sent events.
+    Each event carries a JSON object with a `delta` string; the stream ends
+    with `data: [DONE]`.
+    
+    Args:
+        file_content: File content to generate test for
+        summary: Test case summary to implement
+        framework: Testing framework to target (default: pytest)
+        ai_service: AI service instance
+    
+    Returns:
+        Streaming response of generated code chunks
+    """
+    if not summary:
+        raise HTTPException(
+            status_code=400,
+            detail="Test case summary is required"
+        )
+    
+    return StreamingResponse(
+        _sse_stream(ai_service.stream_test_case_code(file_content, summary, framework), "test case code"),
+        media_type="text/event-stream"
+    )
+
+@router.post("/generate-code-batch", response_model=GenerateCodeBatchResponse)
+async def generate_test_code_batch(
+    request: GenerateCodeBatchRequest,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Generate test case code for several summaries across one or more files.
+    Each file is sent to the model once with all of its summaries, and files
+    are processed concurrently.
+    
+    Args:
+        request: GenerateCodeBatchRequest with files, summaries, and framework
+        ai_service: AI service instance
+    
+    Returns:
+        Generated test case code grouped by file
+    """
+    try:
+        if not request.items or not any(item.summaries for item in request.items):
+            raise HTTPException(
+                status_code=400,
+                detail="At least one test case summary is required"
+            )
+        
+        codes_per_file = await ai_service.generate_test_case_code_for_files(
+            [(item.file_content, item.summaries) for item in request.items],
+            request.framework
+        )
+        
+        results = [
+            GeneratedCodeResult(
+                file_path=item.file_content.path,
+                summaries=item.summaries,
+                codes=codes
+            )
+            for item, codes in zip(request.items, codes_per_file)
+        ]
+        
+        return GenerateCodeBatchResponse(
+            results=results,
+            framework=request.framework,
+            total_count=sum(len(result.codes) for result in results)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error generating batched test case code: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate test case code: {str(e)}"
@@ -165,7 +392,7 @@ async def generate_test(
             )
         
         # Generate test case code using the improved AI service method
-        generated_code = ai_service.generate_test_code_improved(
+        generated_code = await ai_service.generate_test_code_improved(
             request.file_name,
             request.file_content,
             request.scenario
@@ -177,17 +404,56 @@ async def generate_test(
             scenario=request.scenario
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error generating improved test case code: {e}")
+        logger.error("Error generating improved test case code: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate test case code: {str(e)}"
         )
 
+@router.post("/generate-test/stream")
+async def stream_test(
+    request: GenerateTestRequest,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Stream complete pytest test code using the improved prompt as server-sent events.
+    Each event carries a JSON object with a `delta` string; the stream ends
+    with `data: [DONE]`.
+    
+    Args:
+        request: GenerateTestRequest with file_name, file_content, and scenario
+        ai_service: AI service instance
+    
+    Returns:
+        Streaming response of generated code chunks
+    """
+    if not request.scenario:
+        raise HTTPException(
+            status_code=400,
+            detail="Test case scenario is required"
+        )
+    
+    if not request.file_content:
+        raise HTTPException(
+            status_code=400,
+            detail="File content is required"
+        )
+    
+    return StreamingResponse(
+        _sse_stream(
+            ai_service.stream_test_code_improved(request.file_name, request.file_content, request.scenario),
+            "improved test case code"
+        ),
+        media_type="text/event-stream"
+    )
+
 @router.get("/health")
 async def health_check():
-    """Health check endpoint for AI service"""
-    return {"status": "healthy", "service": "AI Test Case Generator"}
+    """Health check endpoint for AI service, including LLM response cache statistics"""
+    return {"status": "healthy", "service": "AI Test Case Generator", "cache": response_cache.stats}
 
 @router.get("/test-connection")
 async def test_ai_connection(
@@ -197,49 +463,21 @@ async def test_ai_connection(
     Perform a minimal real LLM call to verify API key works.
     """
     try:
-        result = ai_service.test_connection()
+        result = await ai_service.test_connection()
         if result.get("ok"):
             return {"status": "connected", "mode": "live", **result}
         raise HTTPException(status_code=502, detail=result.get("error", "LLM call failed"))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error testing AI connection: {e}")
+        logger.error("Error testing AI connection: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to test AI connection: {str(e)}")
 
 @router.get("/supported-frameworks")
 async def get_supported_frameworks():
     """Get list of supported testing frameworks"""
-    return {
-        "frameworks": [
-            {
-                "name": "pytest",
-                "description": "Python testing framework",
-                "language": "Python"
-            },
-            {
-                "name": "selenium",
-                "description": "Python UI automation testing with Selenium",
-                "language": "Python"
-            },
-            {
-                "name": "jest",
-                "description": "JavaScript testing framework",
-                "language": "JavaScript/TypeScript"
-            },
-            {
-                "name": "unittest",
-                "description": "Python built-in testing framework",
-                "language": "Python"
-            },
-            {
-                "name": "mocha",
-                "description": "JavaScript testing framework",
-                "language": "JavaScript/TypeScript"
-            },
-            {
-                "name": "junit",
-                "description": "Java testing framework",
-                "language": "Java"
-            }
-        ],
-        "total_count": 5
-    }
+    return Response(
+        content=_SUPPORTED_FRAMEWORKS_BODY,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=86400, immutable"}
+    )
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from typing import List
+import hashlib
 import logging
 
 try:
+    from ..config import settings
     from ..github_service import GitHubService
     from ..models import (
         FileTreeResponse, 
+        FlatFileTreeResponse,
         FileContentRequest, 
         FileContentResponse,
         RepositoryInfo,
@@ -13,9 +16,11 @@ try:
         ErrorResponse
     )
 except ImportError:
+    from config import settings
     from github_service import GitHubService
     from models import (
         FileTreeResponse, 
+        FlatFileTreeResponse,
         FileContentRequest, 
         FileContentResponse,
         RepositoryInfo,
@@ -29,23 +34,40 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="/repos", tags=["GitHub"])
 
-def get_github_service() -> GitHubService:
-    """Dependency to get GitHub service instance"""
-    try:
-        return GitHubService()
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def get_github_service(request: Request) -> GitHubService:
+    """Dependency to get the app's GitHub service, created on first use and bound to the shared GitHub client"""
+    github_service = getattr(request.app.state, "github_service", None)
+    if github_service is None:
+        try:
+            github_service = request.app.state.github_service = GitHubService(request.app.state.github_api)
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    return github_service
+
+def _tree_response(request: Request, content: bytes) -> Response:
+    """JSON response for a repository tree that browsers may cache and revalidate by ETag"""
+    etag = f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.TREE_CACHE_MAX_AGE}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    # Weak comparison: a W/-prefixed copy of the tag matches too
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    if etag in tags or f"W/{etag}" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
 
-@router.get("/{owner}/{repo}/files", response_model=FileTreeResponse)
+@router.get("/{owner}/{repo}/files", response_model=FileTreeResponse, deprecated=True)
 async def get_repository_files(
+    request: Request,
     owner: str,
     repo: str,
     github_service: GitHubService = Depends(get_github_service)
 ):
     """
     Get file tree for a repository.
+    Deprecated in favour of /{owner}/{repo}/files/flat.
     
     Args:
+        request: Incoming request, checked for If-None-Match
         owner: Repository owner username
         repo: Repository name
         github_service: GitHub service instance
@@ -55,22 +77,70 @@ async def get_repository_files(
     """
     try:
         # Get repository information
-        repo_info = github_service.get_repository_info(owner, repo)
+        repo_info = await github_service.get_repository_info(owner, repo)
         
         # Get file tree
-        files = github_service.get_file_tree(owner, repo)
+        files = await github_service.get_file_tree(owner, repo, ref=repo_info.default_branch)
         
         # Count total files and directories
         total_count = len(files)
         
-        return FileTreeResponse(
+        # Serialize with pydantic-core directly instead of dumping to dicts first
+        response = FileTreeResponse(
             repository=repo_info,
             files=files,
             total_count=total_count
         )
+        return _tree_response(request, response.model_dump_json().encode())
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting repository files for %s/%s: %s", owner, repo, e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get repository files: {str(e)}"
+        )
+
+@router.get("/{owner}/{repo}/files/flat", response_model=FlatFileTreeResponse)
+async def get_repository_files_flat(
+    request: Request,
+    owner: str,
+    repo: str,
+    github_service: GitHubService = Depends(get_github_service)
+):
+    """
+    Get the file tree for a repository as flat parallel arrays.
+    Clients rebuild the hierarchy from the `parents` indices.
+    
+    Args:
+        request: Incoming request, checked for If-None-Match
+        owner: Repository owner username
+        repo: Repository name
+        github_service: GitHub service instance
+    
+    Returns:
+        FlatFileTreeResponse with repository info and flat file tree
+    """
+    try:
+        # Get repository information
+        repo_info = await github_service.get_repository_info(owner, repo)
+        
+        # Get flat file tree
+        tree = await github_service.get_flat_file_tree(owner, repo, ref=repo_info.default_branch)
+        
+        # Serialize with pydantic-core directly instead of dumping to dicts first
+        response = FlatFileTreeResponse(
+            repository=repo_info,
+            tree=tree,
+            total_count=len(tree.paths)
+        )
+        return _tree_response(request, response.model_dump_json().encode())
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting repository files for {owner}/{repo}: {e}")
+        logger.error("Error getting flat repository files for %s/%s: %s", owner, repo, e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get repository files: {str(e)}"
@@ -93,7 +163,7 @@ async def get_file_contents(
     """
     try:
         # Get file contents
-        file_contents = github_service.get_multiple_file_contents(
+        file_contents = await github_service.get_multiple_file_contents(
             request.owner,
             request.repo,
             request.file_paths
@@ -104,8 +174,10 @@ async def get_file_contents(
             total_count=len(file_contents)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting file contents: {e}")
+        logger.error("Error getting file contents: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get file contents: {str(e)}"
@@ -130,13 +202,15 @@ async def test_github_connection(
         Connection status
     """
     try:
-        is_connected = github_service.test_connection()
+        is_connected = await github_service.test_connection()
         if is_connected:
             return {"status": "connected", "message": "GitHub API connection successful"}
         else:
             raise HTTPException(status_code=500, detail="GitHub API connection failed")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error testing GitHub connection: {e}")
+        logger.error("Error testing GitHub connection: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to test GitHub connection: {str(e)}"
@@ -1,10 +1,25 @@
 import os
+import functools
 import logging
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Extensions treated as text by is_text_file
+TEXT_EXTENSIONS = frozenset({
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.scss', '.md',
+    '.txt', '.json', '.xml', '.yaml', '.yml', '.ini', '.cfg', '.conf',
+    '.sh', '.bash', '.zsh', '.fish', '.ps1', '.bat', '.cmd'
+})
+
+# Maps each character that is invalid in filenames, including ASCII control
+# characters, to an underscore
+_SANITIZE_TABLE = str.maketrans({char: '_' for char in '<>:"/\\|?*' + ''.join(map(chr, range(0x20)))})
+
+# Units used by format_file_size, one per power of 1024
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
 def ensure_directory_exists(directory_path: str) -> bool:
     """
     Ensure a directory exists, create it if it doesn't.
@@ -19,9 +34,10 @@ def ensure_directory_exists(directory_path: str) -> bool:
         Path(directory_path).mkdir(parents=True, exist_ok=True)
         return True
     except Exception as e:
-        logger.error(f"Failed to create directory {directory_path}: {e}")
+        logger.error("Failed to create directory %s: %s", directory_path, e)
         return False
 
+@functools.lru_cache(maxsize=4096)
 def get_file_extension(file_path: str) -> str:
     """
     Get the file extension from a file path.
@@ -32,8 +48,14 @@ def get_file_extension(file_path: str) -> str:
     Returns:
         File extension (e.g., '.py', '.js', '.md')
     """
-    return Path(file_path).suffix.lower()
+    # Same result as Path(file_path).suffix without building a Path: the
+    # last dot of the final component, ignoring leading dots (e.g. '.bashrc')
+    file_path = file_path.rstrip('/')
+    name = file_path[file_path.rfind('/') + 1:]
+    i = name.rfind('.')
+    return name[i:].lower() if 0 < i < len(name) - 1 else ''
 
+@functools.lru_cache(maxsize=4096)
 def is_text_file(file_path: str) -> bool:
     """
     Check if a file is likely a text file based on its extension.
@@ -44,13 +66,7 @@ def is_text_file(file_path: str) -> bool:
     Returns:
         True if file appears to be a text file
     """
-    text_extensions = {
-        '.py', '.js', '.jsx', '.ts', '.tsx', '.html', '.css', '.scss', '.md',
-        '.txt', '.json', '.xml', '.yaml', '.yml', '.ini', '.cfg', '.conf',
-        '.sh', '.bash', '.zsh', '.fish', '.ps1', '.bat', '.cmd'
-    }
-    
-    return get_file_extension(file_path) in text_extensions
+    return get_file_extension(file_path) in TEXT_EXTENSIONS
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -62,19 +78,12 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         Sanitized filename
     """
-    # Replace invalid characters with underscores
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    
-    # Remove leading/trailing spaces and dots
-    filename = filename.strip(' .')
+    # Replace invalid characters with underscores in one pass, then remove
+    # leading/trailing spaces and dots
+    filename = filename.translate(_SANITIZE_TABLE).strip(' .')
     
     # Ensure filename is not empty
-    if not filename:
-        filename = 'unnamed_file'
-    
-    return filename
+    return filename or 'unnamed_file'
 
 def format_file_size(size_bytes: int) -> str:
     """
@@ -86,16 +95,14 @@ def format_file_size(size_bytes: int) -> str:
     Returns:
         Formatted size string (e.g., '1.5 MB', '2.3 KB')
     """
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
+    # Integer log2 picks the power of 1024 exactly, even at the boundaries
+    i = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+    s = round(size_bytes / (1 << (i * 10)), 2)
     
-    return f"{s} {size_names[i]}"
+    return f"{s} {_SIZE_UNITS[i]}"
 
 def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     """
@@ -112,4 +119,9 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     if len(text) <= max_length:
         return text
     
-    return text[:max_length - len(suffix)] + suffix
+    keep = max_length - len(suffix)
+    if keep <= 0:
+        # No room for any text; a negative slice bound would keep most of it
+        return suffix[:max(max_length, 0)]
+    
+    return text[:keep] + suffix
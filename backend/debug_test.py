@@ -4,13 +4,15 @@ Debug script to test AI service directly
 """
 
 import os
+import asyncio
+import httpx
 from dotenv import load_dotenv
 from app.ai_service import AIService
 
 # Load environment variables
 load_dotenv()
 
-def test_ai_service_directly():
+async def _debug_ai_service():
     """Test AI service directly to debug the issue"""
     
     print("🔍 Debugging AI Service...")
@@ -23,15 +25,16 @@ def test_ai_service_directly():
         print(f"API Key length: {len(api_key)} characters")
         print(f"API Key starts with: {api_key[:10]}...")
     
+    http = httpx.AsyncClient(http2=True, timeout=httpx.Timeout(60.0))
     try:
         # Initialize AI service
         print("\n🔧 Initializing AI service...")
-        ai_service = AIService()
+        ai_service = AIService(http=http)
         print("✅ AI service initialized successfully")
         
         # Test connection
         print("\n🌐 Testing connection...")
-        is_connected = ai_service.test_connection()
+        is_connected = await ai_service.test_connection()
         print(f"Connection test result: {is_connected}")
         
         # Test the improved method directly
@@ -45,7 +48,7 @@ def subtract(a, b):
     return a - b
 """
         
-        result = ai_service.generate_test_code_improved(
+        result = await ai_service.generate_test_code_improved(
             "calculator.py",
             test_file_content,
             "Test function with valid input parameters"
@@ -67,6 +70,12 @@ def subtract(a, b):
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await http.aclose()
+
+def test_ai_service_directly():
+    """Run the async AI service debug routine"""
+    asyncio.run(_debug_ai_service())
 
 if __name__ == "__main__":
     test_ai_service_directly()
@@ -1,18 +1,16 @@
 #!/usr/bin/env python3
 """
-Test script for the new /ai/generate-test endpoint
+Load probe for the /ai/generate-test endpoint
 """
 
-import requests
-import json
+import asyncio
+import statistics
+import time
+import httpx
 
-def test_generate_test_endpoint():
-    """Test the new generate-test endpoint"""
-    
-    # Test data
-    test_data = {
-        "file_name": "calculator.py",
-        "file_content": """
+URL = "http://127.0.0.1:8000/api/v1/ai/generate-test"
+
+FILE_CONTENT = """
 def add(a, b):
     \"\"\"Add two numbers\"\"\"
     return a + b
@@ -30,43 +28,79 @@ def divide(a, b):
     if b == 0:
         raise ValueError("Cannot divide by zero")
     return a / b
-""",
-        "scenario": "Test function with valid input parameters"
-    }
+"""
+
+SCENARIOS = [
+    "Test function with valid input parameters",
+    "Test division by zero raises ValueError",
+    "Test subtraction with negative results",
+    "Test multiplication by zero",
+    "Test addition of floating point numbers",
+]
+
+async def _timed_post(client: httpx.AsyncClient, payload: dict):
+    """POST one payload and return the response with its latency in seconds"""
+    start = time.perf_counter()
+    response = await client.post(URL, json=payload)
+    return response, time.perf_counter() - start
+
+async def _run_probe(n: int):
+    """Send n concurrent generate-test requests and report latency percentiles"""
     
-    try:
-        # Make the request
-        response = requests.post(
-            "http://127.0.0.1:8000/api/v1/ai/generate-test",
-            json=test_data,
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            print("\n✅ SUCCESS! Generated test code:")
-            print("=" * 50)
-            print(f"File: {result.get('file_name')}")
-            print(f"Scenario: {result.get('scenario')}")
-            print("\nGenerated Code:")
-            print("-" * 30)
-            print(result.get('code', 'No code generated'))
-        else:
-            print(f"\n❌ ERROR: {response.status_code}")
-            print(f"Response: {response.text}")
-            
-    except requests.exceptions.ConnectionError:
-        print("❌ ERROR: Could not connect to server. Make sure the server is running on port 8001.")
-    except requests.exceptions.Timeout:
-        print("❌ ERROR: Request timed out.")
-    except Exception as e:
-        print(f"❌ ERROR: {e}")
+    # Cycle through a few scenarios; concurrent duplicates are not coalesced and all
+    # miss the response cache, so each of the n requests makes its own LLM call
+    payloads = [
+        {
+            "file_name": "calculator.py",
+            "file_content": FILE_CONTENT,
+            "scenario": SCENARIOS[i % len(SCENARIOS)]
+        }
+        for i in range(n)
+    ]
+    
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=200)) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[_timed_post(client, payload) for payload in payloads], return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    
+    latencies = []
+    failures = 0
+    for result in results:
+        if isinstance(result, httpx.ConnectError):
+            print("❌ ERROR: Could not connect to server. Make sure the server is running on port 8000.")
+            return
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"❌ ERROR: {result!r}")
+            continue
+        response, latency = result
+        if response.status_code != 200:
+            failures += 1
+            print(f"❌ ERROR: {response.status_code} {response.text[:200]}")
+            continue
+        latencies.append(latency)
+    
+    print(f"\nRequests: {n}, succeeded: {len(latencies)}, failed: {failures}, wall time: {elapsed:.2f}s")
+    if len(latencies) >= 2:
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f"p50: {percentiles[49] * 1000:.0f}ms, p95: {percentiles[94] * 1000:.0f}ms")
+    elif latencies:
+        print(f"latency: {latencies[0] * 1000:.0f}ms")
+    
+    if latencies:
+        sample = next(r for r in results if not isinstance(r, Exception) and r[0].status_code == 200)[0].json()
+        print("\n✅ Sample generated test code:")
+        print("=" * 50)
+        print(f"File: {sample.get('file_name')}")
+        print(f"Scenario: {sample.get('scenario')}")
+        print("-" * 30)
+        print(sample.get('code', 'No code generated'))
+
+def probe_generate_test_endpoint(n: int = 50):
+    """Run the concurrent generate-test load probe (not collected by pytest: it makes n paid LLM calls)"""
+    asyncio.run(_run_probe(n))
 
 if __name__ == "__main__":
-    print("Testing new /ai/generate-test endpoint...")
+    print("Probing /ai/generate-test endpoint...")
     print("=" * 50)
-    test_generate_test_endpoint()
+    probe_generate_test_endpoint()
@@ -73,7 +73,7 @@ def test_github_service():
     
     try:
         # This will fail if no token is set, but that's expected
-        service = GitHubService()
+        service = GitHubService(gh=None)
         print("✓ GitHub service initialized successfully")
         return True
     except ValueError as e:
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 from fastapi.testclient import TestClient
@@ -8,7 +9,9 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
+from app.ai_service import SUPPORTED_FRAMEWORKS
 from app.main import app
+from app.routes.ai_routes import _sse_stream, get_ai_service
 
 client = TestClient(app)
 
@@ -19,6 +22,15 @@ def test_ai_health():
     assert r.json().get('service')
 
 
+def test_supported_frameworks_is_cacheable():
+    r = client.get('/api/v1/ai/supported-frameworks')
+    assert r.status_code == 200
+    body = r.json()
+    assert body['total_count'] == len(body['frameworks'])
+    assert [fw['name'] for fw in body['frameworks']] == list(SUPPORTED_FRAMEWORKS)
+    assert 'immutable' in r.headers['cache-control']
+
+
 @patch.dict(os.environ, {'OPENROUTER_API_KEY': ''})
 def test_ai_summarize_with_content_mock():
     payload = [{
@@ -35,3 +47,35 @@ def test_ai_summarize_with_content_mock():
     assert isinstance(body['summaries'], list)
 
 
+def test_ai_summarize_with_no_files_is_client_error():
+    app.dependency_overrides[get_ai_service] = lambda: None
+    try:
+        r = client.post('/api/v1/ai/summarize-tests-with-content', json=[])
+        assert r.status_code == 400
+        assert r.json()['detail'] == "No file contents provided"
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_ai_summarize_tests_route_removed():
+    r = client.post('/api/v1/ai/summarize-tests')
+    assert r.status_code == 404
+
+
+def test_sse_stream_closes_inner_stream_when_closed_early():
+    closed = []
+
+    async def chunks():
+        try:
+            yield "a"
+            yield "b"
+        finally:
+            closed.append(True)
+
+    async def run():
+        stream = _sse_stream(chunks(), "code")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first, list(closed)
+
+    assert asyncio.run(run()) == (b'data: {"delta":"a"}\n\n', [True])
@@ -0,0 +1,389 @@
+import asyncio
+import httpx
+import json
+import pytest
+import time
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app import ai_service as ai_service_module
+from app.ai_service import AIService, _pack_by_tokens
+from app.config import settings
+from app.llm_cache import LLMCache
+from app.models import FileContent
+
+
+@pytest.fixture
+def ai_service(monkeypatch):
+    monkeypatch.setattr(settings, 'AI_PROVIDER', 'openrouter')
+    monkeypatch.setattr(settings, 'OPENROUTER_API_KEY', 'test-key')
+    return AIService(http=None, cache=LLMCache())
+
+
+@pytest.fixture
+def file_content():
+    return FileContent(
+        path="maths.py",
+        content="def add(a,b): return a+b",
+        encoding="utf-8",
+        size=24,
+        sha="abc123"
+    )
+
+
+def _completion(text):
+    return {"choices": [{"message": {"content": text}}]}
+
+
+def test_code_batch_uses_single_request(ai_service, file_content, monkeypatch):
+    calls = []
+
+    async def fake_request(messages, model=None):
+        calls.append(messages)
+        return _completion(json.dumps([
+            {"id": 2, "code": "def test_two(): pass"},
+            {"id": 1, "code": "def test_one(): pass"},
+        ]))
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    codes = asyncio.run(ai_service.generate_test_case_code_batch(file_content, ["one", "two"]))
+
+    assert codes == ["def test_one(): pass", "def test_two(): pass"]
+    assert len(calls) == 1
+
+
+def test_code_batch_falls_back_for_missing_ids(ai_service, file_content, monkeypatch):
+    async def fake_request(messages, model=None):
+        if "JSON array" in messages[0]["content"][0]["text"]:
+            return _completion(json.dumps([{"id": 1, "code": "def test_one(): pass"}]))
+        return _completion("def test_two(): pass")
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    codes = asyncio.run(ai_service.generate_test_case_code_batch(file_content, ["one", "two"]))
+
+    assert codes == ["def test_one(): pass", "def test_two(): pass"]
+
+
+def test_code_generation_is_cached(ai_service, file_content, monkeypatch):
+    calls = []
+
+    async def fake_request(messages, model=None):
+        calls.append(messages)
+        return _completion("def test_one(): pass")
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    first = asyncio.run(ai_service.generate_test_case_code(file_content, "one"))
+    second = asyncio.run(ai_service.generate_test_case_code(file_content, "one"))
+    batch = asyncio.run(ai_service.generate_test_case_code_batch(file_content, ["one"]))
+
+    assert first == second == "def test_one(): pass"
+    assert batch == [first]
+    assert len(calls) == 1
+
+
+def test_streamed_code_is_cached(ai_service, file_content, monkeypatch):
+    async def fake_stream(messages):
+        for chunk in ["def test_one():", " pass"]:
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in ai_service.stream_test_case_code(file_content, "one")]
+
+    monkeypatch.setattr(ai_service, '_stream_completion', fake_stream)
+    assert asyncio.run(collect()) == ["def test_one():", " pass"]
+    assert asyncio.run(collect()) == ["def test_one(): pass"]
+
+
+def test_streamed_improved_code_is_cached(ai_service, monkeypatch):
+    async def fake_stream(messages):
+        for chunk in ["```python\ndef test_add():", " pass\n```"]:
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in ai_service.stream_test_code_improved("maths.py", "def add(a,b): return a+b", "adds")]
+
+    monkeypatch.setattr(ai_service, '_stream_completion', fake_stream)
+    assert asyncio.run(collect()) == ["```python\ndef test_add():", " pass\n```"]
+    assert asyncio.run(collect()) == ["```python\ndef test_add(): pass\n```"]
+
+
+def test_empty_stream_is_not_cached(ai_service, file_content, monkeypatch):
+    calls = []
+
+    async def fake_stream(messages):
+        calls.append(messages)
+        for chunk in ["", "  \n"]:
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in ai_service.stream_test_case_code(file_content, "one")]
+
+    monkeypatch.setattr(ai_service, '_stream_completion', fake_stream)
+    asyncio.run(collect())
+    asyncio.run(collect())
+    assert len(calls) == 2
+
+
+def test_stream_error_frame_raises_and_is_not_cached(ai_service, file_content):
+    frames = [
+        {"choices": [{"delta": {"content": "def test_one():"}}]},
+        {"choices": [], "error": {"code": 502, "message": "upstream provider failed"}},
+    ]
+    body = b"".join(b"data: " + json.dumps(frame).encode() + b"\n\n" for frame in frames)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=body)
+
+    async def collect():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            ai_service.http = client
+            return [chunk async for chunk in ai_service.stream_test_case_code(file_content, "one")]
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="upstream provider failed"):
+            asyncio.run(collect())
+    assert len(requests) == 2
+
+
+def test_generated_code_is_stripped_of_fences(ai_service, file_content, monkeypatch):
+    async def fake_request(messages, model=None):
+        return _completion("Here is the test:\n```python\ndef test_one(): pass\n```\nDone.")
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    assert asyncio.run(ai_service.generate_test_case_code(file_content, "one")) == "def test_one(): pass"
+
+
+def test_every_fenced_block_is_kept(ai_service, file_content, monkeypatch):
+    async def fake_request(messages, model=None):
+        return _completion("```python\nimport pytest\n```\nThen the test:\n```python\ndef test_one(): pass\n```")
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    assert asyncio.run(ai_service.generate_test_case_code(file_content, "one")) == "import pytest\n\ndef test_one(): pass"
+
+
+def test_unparseable_json_response_falls_back(ai_service):
+    assert ai_service._extract_json_from_response("no json here") == [{"id": 1, "summary": "Failed to parse AI response"}]
+
+
+def test_summaries_for_files_share_one_batched_request(ai_service, file_content, monkeypatch):
+    other = file_content.model_copy(update={"path": "other.py", "sha": "def456"})
+    skipped = file_content.model_copy(update={"path": "skipped.py", "sha": "789abc"})
+    calls = []
+
+    async def fake_request(messages, model=None, json_response=False):
+        calls.append(json_response)
+        if json_response:
+            prompt = messages[1]["content"]
+            assert "===FILE path=maths.py sha=abc123===" in prompt
+            return _completion(json.dumps({"files": [
+                {"file": "maths.py", "summaries": [{"id": 1, "summary": "adds numbers"}]},
+                {"file": "other.py", "summaries": [{"id": 1, "summary": "other case"}]},
+            ]}))
+        return _completion('[{"id": 1, "summary": "retried alone"}]')
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    results = asyncio.run(ai_service.generate_test_case_summaries_for_files([file_content, other, skipped]))
+
+    # One batched call, plus a single-file retry for the file the batch reply skipped
+    assert calls == [True, False]
+    assert results == [
+        [{"id": 1, "summary": "adds numbers", "file": "maths.py"}],
+        [{"id": 1, "summary": "other case", "file": "other.py"}],
+        [{"id": 1, "summary": "retried alone", "file": "skipped.py"}],
+    ]
+
+    calls.clear()
+    assert asyncio.run(ai_service.generate_test_case_summaries_for_files([file_content, other])) == results[:2]
+    assert calls == []
+
+
+def test_pack_by_tokens_respects_budget():
+    bins = _pack_by_tokens([50, 40, 30, 20, 120], 100)
+
+    assert sorted(idx for b in bins for idx in b) == [0, 1, 2, 3, 4]
+    assert [4] in bins
+    assert all(sum([50, 40, 30, 20, 120][idx] for idx in b) <= 100 for b in bins if b != [4])
+    assert len(bins) == 3
+
+
+def test_summaries_are_cached_unless_unparseable(ai_service, file_content, monkeypatch):
+    replies = ["not json", '[{"id": 1, "summary": "adds numbers"}]', "unused"]
+
+    async def fake_request(messages, model=None):
+        return _completion(replies.pop(0))
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    first = asyncio.run(ai_service.generate_test_case_summaries([file_content]))
+    second = asyncio.run(ai_service.generate_test_case_summaries([file_content]))
+    third = asyncio.run(ai_service.generate_test_case_summaries([file_content]))
+
+    assert first == [{"id": 1, "summary": "Failed to parse AI response"}]
+    assert second == third == [{"id": 1, "summary": "adds numbers"}]
+    assert replies == ["unused"]
+
+
+def test_summary_batch_submit_and_collect(file_content, monkeypatch):
+    monkeypatch.setattr(settings, 'AI_PROVIDER', 'openrouter')
+    monkeypatch.setattr(settings, 'OPENROUTER_API_KEY', 'test-key')
+    monkeypatch.setattr(settings, 'BATCH_API_KEY', 'batch-key')
+    uploaded = []
+
+    def handler(request):
+        path = request.url.path
+        if path.endswith("/files"):
+            uploaded.append(request.content)
+            return httpx.Response(200, json={"id": "file-in"})
+        if path.endswith("/batches"):
+            assert json.loads(request.content)["input_file_id"] == "file-in"
+            return httpx.Response(200, json={"id": "batch-1", "status": "validating"})
+        if path.endswith("/batches/batch-1"):
+            return httpx.Response(200, json={"id": "batch-1", "status": "completed", "output_file_id": "file-out"})
+        if path.endswith("/files/file-out/content"):
+            line = {
+                "custom_id": "maths.py",
+                "response": {"status_code": 200, "body": {"choices": [{"message": {"content": '[{"id": 1, "summary": "adds"}]'}}]}},
+                "error": None,
+            }
+            return httpx.Response(200, content=json.dumps(line).encode())
+        return httpx.Response(404)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            service = AIService(http=http, cache=LLMCache())
+            job = await service.submit_summary_batch([file_content])
+            return job, await service.get_summary_batch(job["job_id"])
+
+    job, result = asyncio.run(run())
+
+    assert job == {"job_id": "batch-1", "status": "validating"}
+    assert b'"custom_id":"maths.py"' in uploaded[0]
+    assert result["summaries_by_path"] == {"maths.py": [{"id": 1, "summary": "adds"}]}
+    assert result["errors"] == []
+
+
+def test_code_requests_group_by_file(ai_service, file_content, monkeypatch):
+    other = file_content.model_copy(update={"path": "other.py", "sha": "def456"})
+    calls = []
+
+    async def fake_batch(fc, summaries, framework="pytest"):
+        calls.append((fc.path, summaries))
+        return [f"{fc.path}:{summary}" for summary in summaries]
+
+    async def fake_single(fc, summary, framework="pytest"):
+        calls.append((fc.path, summary))
+        return f"{fc.path}:{summary}"
+
+    monkeypatch.setattr(ai_service, 'generate_test_case_code_batch', fake_batch)
+    monkeypatch.setattr(ai_service, 'generate_test_case_code', fake_single)
+    results = asyncio.run(ai_service.generate_test_case_code_requests([
+        (file_content, "one", "pytest"),
+        (other, "one", "pytest"),
+        (file_content, "two", "pytest"),
+    ]))
+
+    assert results == ["maths.py:one", "other.py:one", "maths.py:two"]
+    assert sorted(calls) == [("maths.py", ["one", "two"]), ("other.py", "one")]
+
+
+def test_lone_code_request_uses_plain_prompt(ai_service, file_content, monkeypatch):
+    calls = []
+
+    async def fake_request(messages, model=None):
+        calls.append(messages)
+        return _completion("def test_one(): pass")
+
+    monkeypatch.setattr(ai_service, '_make_openrouter_request', fake_request)
+    results = asyncio.run(ai_service.generate_test_case_code_requests([(file_content, "one", "pytest")]))
+
+    assert results == ["def test_one(): pass"]
+    assert len(calls) == 1
+
+
+def test_failed_encoding_load_is_retried(monkeypatch):
+    sentinel = object()
+    attempts = []
+
+    def fake_get_encoding(name):
+        attempts.append(name)
+        if len(attempts) == 1:
+            raise OSError("offline")
+        return sentinel
+
+    monkeypatch.setattr(ai_service_module.tiktoken, 'get_encoding', fake_get_encoding)
+    monkeypatch.setattr(ai_service_module, '_encoding', None)
+    monkeypatch.setattr(ai_service_module, '_encoding_retry_at', 0.0)
+
+    assert ai_service_module.load_encoding() is None
+    assert ai_service_module.load_encoding() is sentinel
+    assert ai_service_module._get_encoding() is sentinel
+
+
+def test_encoding_load_does_not_block_the_loop(monkeypatch):
+    sentinel = object()
+
+    def slow_get_encoding(name):
+        time.sleep(0.3)
+        return sentinel
+
+    monkeypatch.setattr(ai_service_module.tiktoken, 'get_encoding', slow_get_encoding)
+    monkeypatch.setattr(ai_service_module, '_encoding', None)
+    monkeypatch.setattr(ai_service_module, '_encoding_retry_at', 0.0)
+
+    async def run():
+        start = time.perf_counter()
+        ai_service_module.start_encoding_load()
+        started_in = time.perf_counter() - start
+        before = ai_service_module._get_encoding()
+        await asyncio.sleep(0.5)
+        return started_in, before, ai_service_module._get_encoding()
+
+    started_in, before, after = asyncio.run(run())
+    assert started_in < 0.1
+    assert before is None
+    assert after is sentinel
+
+
+class _RecordingEncoding:
+    """Stand-in tokenizer: one token per 4 characters, recording what it encodes"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text, disallowed_special=()):
+        self.encoded.append(len(text))
+        return list(range(len(text) // 4))
+
+    def decode(self, tokens):
+        return "x" * (len(tokens) * 4)
+
+
+def test_truncation_encodes_only_a_bounded_prefix(monkeypatch):
+    encoding = _RecordingEncoding()
+    monkeypatch.setattr(ai_service_module, '_encoding', encoding)
+    monkeypatch.setattr(ai_service_module, '_truncation_cache', ai_service_module.LRUCache(maxsize=16))
+    text = "y" * 5_000_000
+
+    assert ai_service_module.truncated_token_count(text, 500) == 500
+    assert len(ai_service_module.truncate_to_tokens(text, 500)) == 2000
+    assert encoding.encoded == [500 * ai_service_module._MAX_CHARS_PER_TOKEN]
+
+
+def test_batch_sizing_of_huge_file_is_bounded(ai_service, file_content, monkeypatch):
+    encoding = _RecordingEncoding()
+    monkeypatch.setattr(ai_service_module, '_encoding', encoding)
+    monkeypatch.setattr(ai_service_module, '_truncation_cache', ai_service_module.LRUCache(maxsize=16))
+    huge = file_content.model_copy(update={"path": "huge.py", "content": "y" * 5_000_000})
+
+    async def fake_summaries(file_contents, framework="pytest"):
+        return [{"id": 1, "summary": "s"}]
+
+    monkeypatch.setattr(ai_service, 'generate_test_case_summaries', fake_summaries)
+    results = asyncio.run(ai_service.generate_test_case_summaries_for_files([huge]))
+
+    assert results == [[{"id": 1, "summary": "s", "file": "huge.py"}]]
+    assert max(encoding.encoded) <= ai_service_module.SUMMARY_FILE_TOKEN_BUDGET * ai_service_module._MAX_CHARS_PER_TOKEN
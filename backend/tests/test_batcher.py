@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.batcher import AsyncBatcher
+
+
+def test_concurrent_submits_share_one_batch():
+    batches = []
+
+    async def process(items):
+        batches.append(items)
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = AsyncBatcher(process, max_batch_size=8, max_wait_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+def test_exception_result_fails_only_its_item():
+    async def process(items):
+        return [ValueError("bad") if item == "bad" else item for item in items]
+
+    async def run():
+        batcher = AsyncBatcher(process, max_wait_ms=5)
+        batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit("ok"), batcher.submit("bad"), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    ok, bad = asyncio.run(run())
+    assert ok == "ok"
+    assert isinstance(bad, ValueError)
+
+
+def test_submit_requires_running_batcher():
+    async def process(items):
+        return items
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(AsyncBatcher(process).submit(1))
+
+
+def test_stop_fails_in_flight_requests():
+    async def process(items):
+        await asyncio.sleep(10)
+        return items
+
+    async def run():
+        batcher = AsyncBatcher(process, max_wait_ms=1)
+        batcher.start()
+        pending = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.wait_for(pending, 1)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
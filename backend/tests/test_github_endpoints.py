@@ -7,7 +7,10 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
+from app.config import settings
 from app.main import app
+from app.models import FlatFileTree, RepositoryInfo
+from app.routes.github_routes import get_github_service
 
 client = TestClient(app)
 
@@ -24,3 +27,32 @@ def test_github_health():
     assert r.json().get('service')
 
 
+def test_oversized_request_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, 'MAX_REQUEST_BYTES', 10)
+    r = client.post('/api/v1/repos/file-contents', json={"owner": "o", "repo": "r", "file_paths": ["a.py"]})
+    assert r.status_code == 413
+
+
+class FakeGitHubService:
+    async def get_repository_info(self, owner, repo):
+        return RepositoryInfo(owner=owner, name=repo, full_name=f"{owner}/{repo}", default_branch="main")
+
+    async def get_flat_file_tree(self, owner, repo, ref=None):
+        return FlatFileTree(names=["a.py"], paths=["a.py"], types=["file"], shas=["s1"], sizes=[1], parents=[-1])
+
+
+def test_flat_tree_revalidates_by_etag():
+    app.dependency_overrides[get_github_service] = FakeGitHubService
+    try:
+        first = client.get('/api/v1/repos/o/r/files/flat')
+        assert first.status_code == 200
+        assert first.headers['cache-control'].startswith('public')
+
+        second = client.get('/api/v1/repos/o/r/files/flat', headers={'If-None-Match': first.headers['etag']})
+        assert second.status_code == 304
+        assert second.content == b''
+
+        weak = client.get('/api/v1/repos/o/r/files/flat', headers={'If-None-Match': '"other", W/' + first.headers['etag']})
+        assert weak.status_code == 304
+    finally:
+        app.dependency_overrides.clear()
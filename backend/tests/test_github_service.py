@@ -0,0 +1,161 @@
+import asyncio
+import http
+import pytest
+from gidgethub import BadRequest
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.config import settings
+from app.github_service import GitHubService
+
+
+@pytest.fixture
+def github_service(monkeypatch):
+    monkeypatch.setattr(settings, 'GITHUB_TOKEN', 'test-token')
+    return GitHubService(gh=None)
+
+
+def _entry(path, type_):
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "path": path,
+        "type": type_,
+        "size": 0 if type_ == "dir" else 10,
+        "sha": f"sha-{path}",
+        "url": f"https://api.github.com/repos/o/r/contents/{path}",
+    }
+
+
+def test_file_tree_builds_nested_nodes_from_git_tree(github_service, monkeypatch):
+    calls = []
+
+    async def fake_get(path, params=None):
+        calls.append(path)
+        return {
+            "truncated": False,
+            "tree": [
+                {"path": "README.md", "type": "blob", "mode": "100644", "sha": "s1", "size": 10},
+                {"path": "src", "type": "tree", "mode": "040000", "sha": "s2"},
+                {"path": "src/app.py", "type": "blob", "mode": "100644", "sha": "s3", "size": 20},
+            ],
+        }
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    tree = asyncio.run(github_service.get_file_tree("o", "r", ref="main"))
+
+    assert calls == ["/repos/o/r/git/trees/main"]
+    assert [node.path for node in tree] == ["README.md", "src"]
+    assert tree[0].children is None
+    assert [child.path for child in tree[1].children] == ["src/app.py"]
+    assert tree[1].children[0].url.endswith("/repos/o/r/contents/src/app.py?ref=main")
+
+
+def test_flat_file_tree_links_parents_by_index(github_service, monkeypatch):
+    async def fake_get(path, params=None):
+        return {
+            "truncated": False,
+            "tree": [
+                {"path": "README.md", "type": "blob", "mode": "100644", "sha": "s1", "size": 10},
+                {"path": "src", "type": "tree", "mode": "040000", "sha": "s2"},
+                {"path": "src/app.py", "type": "blob", "mode": "100644", "sha": "s3", "size": 20},
+            ],
+        }
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    flat = asyncio.run(github_service.get_flat_file_tree("o", "r", ref="main"))
+
+    assert flat.names == ["README.md", "src", "app.py"]
+    assert [t.value for t in flat.types] == ["file", "dir", "file"]
+    assert flat.parents == [-1, -1, 1]
+
+
+def test_file_tree_falls_back_when_truncated(github_service, monkeypatch):
+    listings = {
+        "/repos/o/r/git/trees/main": {"truncated": True, "tree": []},
+        "/repos/o/r/contents/": [_entry("src", "dir"), _entry("README.md", "file")],
+        "/repos/o/r/contents/src": [_entry("src/app.py", "file")],
+    }
+    refs = []
+
+    async def fake_get(path, params=None):
+        if "/contents/" in path:
+            refs.append(params)
+        return listings[path]
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    tree = asyncio.run(github_service.get_file_tree("o", "r", ref="main"))
+
+    assert refs == [{"ref": "main"}, {"ref": "main"}]
+    assert [node.path for node in tree] == ["src", "README.md"]
+    assert [child.path for child in tree[0].children] == ["src/app.py"]
+    assert tree[1].children is None
+
+
+def test_flat_file_tree_fallback_reads_the_requested_ref(github_service, monkeypatch):
+    listings = {
+        "/repos/o/r/git/trees/v1": {"truncated": True, "tree": []},
+        "/repos/o/r/contents/": [_entry("src", "dir")],
+        "/repos/o/r/contents/src": [_entry("src/app.py", "file")],
+    }
+    refs = []
+
+    async def fake_get(path, params=None):
+        if "/contents/" in path:
+            refs.append(params)
+        return listings[path]
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    flat = asyncio.run(github_service.get_flat_file_tree("o", "r", ref="v1"))
+
+    assert refs == [{"ref": "v1"}, {"ref": "v1"}]
+    assert flat.names == ["src", "app.py"]
+
+
+def test_multiple_file_contents_skips_failures(github_service, monkeypatch):
+    async def fake_get(path, params=None, accept=None):
+        if path.endswith("missing.py"):
+            raise BadRequest(http.HTTPStatus.NOT_FOUND)
+        return "print(1)"
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    files = asyncio.run(github_service.get_multiple_file_contents("o", "r", ["ok.py", "missing.py"]))
+
+    assert [f.path for f in files] == ["ok.py"]
+    assert files[0].content == "print(1)"
+    assert files[0].size == 8
+    # Same value as `git hash-object` for these bytes
+    assert files[0].sha == "b41e3eea2e49488dd0f1b80fec905c6c1e77205f"
+
+
+def test_multiple_file_contents_fetches_repeated_paths_once(github_service, monkeypatch):
+    calls = []
+
+    async def fake_get(path, params=None, accept=None):
+        calls.append(path)
+        return "print(1)"
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+    files = asyncio.run(github_service.get_multiple_file_contents("o", "r", ["a.py", "b.py", "a.py"]))
+
+    assert [f.path for f in files] == ["a.py", "b.py", "a.py"]
+    assert calls == ["/repos/o/r/contents/a.py", "/repos/o/r/contents/b.py"]
+
+
+def test_connection_checks_the_api_every_time(github_service, monkeypatch):
+    responses = [{"login": "octocat"}, BadRequest(http.HTTPStatus.UNAUTHORIZED)]
+
+    async def fake_get(path, params=None):
+        assert path == "/user"
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(github_service, '_get', fake_get)
+
+    assert asyncio.run(github_service.test_connection()) is True
+    assert asyncio.run(github_service.test_connection()) is False
+    assert responses == []
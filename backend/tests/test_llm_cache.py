@@ -0,0 +1,44 @@
+import asyncio
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app import llm_cache
+from app.llm_cache import LLMCache, make_cache_key
+
+
+def test_cache_key_is_order_independent_and_versioned(monkeypatch):
+    key = make_cache_key(model="m", framework="pytest", scenario="s")
+
+    assert key == make_cache_key(scenario="s", framework="pytest", model="m")
+    assert key != make_cache_key(model="m", framework="jest", scenario="s")
+    monkeypatch.setattr(llm_cache, 'PROMPT_VERSION', "2")
+    assert key != make_cache_key(model="m", framework="pytest", scenario="s")
+
+
+def test_get_or_set_counts_hits_and_misses():
+    cache = LLMCache()
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return "value"
+
+    async def run():
+        return [await cache.get_or_set("k", factory) for _ in range(3)]
+
+    assert asyncio.run(run()) == ["value"] * 3
+    assert len(calls) == 1
+    assert cache.stats == {"backend": "memory", "hits": 2, "misses": 1, "errors": 0, "hit_rate": 0.667, "size": 1}
+
+
+def test_get_or_set_skips_uncacheable_values():
+    cache = LLMCache()
+
+    async def factory():
+        return "failed"
+
+    asyncio.run(cache.get_or_set("k", factory, cacheable=lambda value: value != "failed"))
+    assert asyncio.run(cache.get("k")) is None
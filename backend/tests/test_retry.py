@@ -0,0 +1,43 @@
+import asyncio
+import httpx
+import pytest
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.retry import retry_transient
+
+
+def _status_error(status_code, headers=None):
+    request = httpx.Request("POST", "https://example.test")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_transient_errors_are_retried():
+    calls = []
+
+    @retry_transient
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _status_error(503 if len(calls) == 1 else 429, {"Retry-After": "0"})
+        return "ok"
+
+    assert asyncio.run(call()) == "ok"
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    @retry_transient
+    async def call():
+        calls.append(1)
+        raise _status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(call())
+    assert len(calls) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.utils import format_file_size, get_file_extension, is_text_file, sanitize_filename, truncate_text, TEXT_EXTENSIONS
+
+
+@pytest.mark.parametrize("path", [
+    "src/app.py", "README.MD", ".bashrc", "config/.env", "file.", "archive.tar.gz",
+    "a..b", "..", "dir.d/Makefile", "src/app.py/", ".hidden.txt", "",
+])
+def test_file_extension_matches_pathlib_suffix(path):
+    suffix = Path(path).suffix.lower()
+    assert get_file_extension(path) == suffix
+    assert is_text_file(path) == (suffix in TEXT_EXTENSIONS)
+
+
+@pytest.mark.parametrize("size, expected", [
+    (0, "0 B"),
+    (-1, "0 B"),
+    (1, "1.0 B"),
+    (1023, "1023.0 B"),
+    (1024, "1.0 KB"),
+    (1536, "1.5 KB"),
+    # Unit is picked by the exact power of 1024, so the value may round up to 1024.0
+    (1024 ** 2 - 1, "1024.0 KB"),
+    (1024 ** 2, "1.0 MB"),
+    (1024 ** 5, "1.0 PB"),
+    (1024 ** 6, "1024.0 PB"),
+])
+def test_format_file_size_boundaries(size, expected):
+    assert format_file_size(size) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("report.txt", "report.txt"),
+    ('a<b>c:d"e/f\\g|h?i*j', "a_b_c_d_e_f_g_h_i_j"),
+    ("nul\x00byte\x1f.txt", "nul_byte_.txt"),
+    ("tab\there\nnewline", "tab_here_newline"),
+    ("  .hidden. ", "hidden"),
+    (" . ", "unnamed_file"),
+])
+def test_sanitize_filename(name, expected):
+    assert sanitize_filename(name) == expected
+
+
+@pytest.mark.parametrize("max_length, expected", [
+    (10, "abcdef"),
+    (6, "abcdef"),
+    (5, "ab..."),
+    (4, "a..."),
+    # No room for text once max_length is at or below len("..."): never longer than max_length
+    (3, "..."),
+    (2, ".."),
+    (0, ""),
+    (-1, ""),
+])
+def test_truncate_text_respects_max_length(max_length, expected):
+    assert truncate_text("abcdef", max_length) == expected
@@ -7,12 +7,11 @@ export async function fetchRepoFiles(owner, repo) {
     throw new Error('Owner and repository name are required')
   }
   
-  const url = `${BASE}/repos/${encodeURIComponent(owner)}/${encodeURIComponent(repo)}/files`
+  const url = `${BASE}/repos/${encodeURIComponent(owner)}/${encodeURIComponent(repo)}/files/flat`
   try {
     const res = await axios.get(url, { timeout: 8000 })
-    // Backend returns { repository, files: FileNode[], total_count }
-    const nodes = res.data?.files || []
-    return flattenFiles(nodes)
+    // Backend returns { repository, tree: { names, paths, types, shas, sizes, parents }, total_count }
+    return filesFromFlatTree(res.data?.tree)
   } catch (err) {
     throw normalizeAxiosError(err)
   }
@@ -175,29 +174,16 @@ function normalizeAxiosError(err) {
   return new Error('Unknown error occurred')
 }
 
-function flattenFiles(nodes, prefix = '') {
-  if (!nodes || !Array.isArray(nodes)) {
+function filesFromFlatTree(tree) {
+  if (!tree || !Array.isArray(tree.paths) || !Array.isArray(tree.types)) {
     return []
   }
-  
+
   const files = []
-  const walk = (n, pfx) => {
-    for (const node of n) {
-      if (!node || typeof node !== 'object') {
-        continue // Skip invalid nodes
-      }
-      
-      const full = pfx ? `${pfx}/${node.name}` : node.name
-      const nodeType = node.type || node.file_type
-      if (nodeType === 'file') {
-        files.push({ path: node.path || full, size: node.size || 0 })
-      } else if (nodeType === 'dir' || nodeType === 'directory' || node.children) {
-        walk(node.children || [], full)
-      }
+  tree.paths.forEach((path, i) => {
+    if (tree.types[i] === 'file') {
+      files.push({ path, size: tree.sizes?.[i] || 0 })
     }
-  }
-  walk(nodes, prefix)
+  })
   return files
 }
-
-